@@ -0,0 +1,166 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from DiGraph import DiGraph
+from GraphAlgo import GraphAlgo
+from GraphInterface import GraphInterface
+
+
+class ReadWriteLock(object):
+    """
+     * This class represents a readers-writer lock: any number of readers may hold it together,
+     * while a writer holds it alone. Waiting writers block new readers, so writers do not starve.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers > 0:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers > 0:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class ConcurrentGraph(GraphInterface):
+    """
+     * This class represents a thread safe wrapper of a DiGraph, for serving many threads at once.
+     * Every change of the graph is made under the write side of a readers-writer lock, and every read
+     * under the read side. Dictionaries are returned as copies, so they stay valid after the lock is released.
+     * Long queries should not hold the lock: query_batch() runs them on a snapshot of the graph (see
+     * DiGraph.snapshot()), which the writers keep off by copy-on-write, so readers and writers never wait
+     * for each other for longer than a single operation.
+    """
+
+    def __init__(self, graph: DiGraph = None):
+        self._graph = graph if graph is not None else DiGraph()
+        self.lock = ReadWriteLock()
+
+    @property
+    def v_size(self) -> int:
+        return self._graph.v_size
+
+    @property
+    def e_size(self) -> int:
+        return self._graph.e_size
+
+    def get_mc(self) -> int:
+        return self._graph.get_mc()
+
+    def get_node(self, key):
+        return self._graph.get_node(key)
+
+    def get_all_v(self) -> dict:
+        with self.lock.read_locked():
+            return dict(self._graph.get_all_v())
+
+    def all_in_edges_of_node(self, id1: int) -> dict:
+        with self.lock.read_locked():
+            edges = self._graph.all_in_edges_of_node(id1)
+            return None if edges is None else dict(edges)
+
+    def all_out_edges_of_node(self, id1: int) -> dict:
+        with self.lock.read_locked():
+            edges = self._graph.all_out_edges_of_node(id1)
+            return None if edges is None else dict(edges)
+
+    def add_edge(self, id1: int, id2: int, weight: float) -> bool:
+        with self.lock.write_locked():
+            return self._graph.add_edge(id1, id2, weight)
+
+    def add_node(self, node_id: int, pos: tuple = None) -> bool:
+        with self.lock.write_locked():
+            return self._graph.add_node(node_id, pos)
+
+    def set_node_location(self, node_id: int, pos: tuple) -> bool:
+        with self.lock.write_locked():
+            return self._graph.set_node_location(node_id, pos)
+
+    def remove_node(self, node_id: int) -> bool:
+        with self.lock.write_locked():
+            return self._graph.remove_node(node_id)
+
+    def remove_edge(self, node_id1: int, node_id2: int) -> bool:
+        with self.lock.write_locked():
+            return self._graph.remove_edge(node_id1, node_id2)
+
+    def update_edge_weight(self, id1: int, id2: int, weight: float) -> bool:
+        with self.lock.write_locked():
+            return self._graph.update_edge_weight(id1, id2, weight)
+
+    def update_edge_weights(self, updates) -> int:
+        with self.lock.write_locked():
+            return self._graph.update_edge_weights(updates)
+
+    def snapshot(self):
+        """
+        * Returns a consistent, read only view of the graph (O(1)), see DiGraph.snapshot().
+        """
+        with self.lock.write_locked():  # Taking a snapshot resets the graph's copy-on-write bookkeeping
+            return self._graph.snapshot()
+
+    @contextmanager
+    def read(self):
+        """
+        * Holds the read lock for a few consecutive reads of the underlying graph:
+        *   with cg.read() as g:
+        *       ...
+        """
+        with self.lock.read_locked():
+            yield self._graph
+
+    def query_batch(self, queries: list, workers: int = None) -> list:
+        """
+        * Runs a batch of GraphAlgo queries on a thread pool, all of them on the same snapshot of the graph.
+        * The GraphAlgo query methods never write to the graph, so the threads do not share any mutable state,
+        * and on free-threaded builds of python the queries run in parallel.
+        @param queries: A list of (method name, args tuple), e.g. [("shortest_path", (0, 5)), ("connected_component", (3,))]
+        @param workers: The number of threads (the default of ThreadPoolExecutor if None)
+        @return: The list of results, in the order of the queries
+        """
+        algo = GraphAlgo(self.snapshot())
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(getattr(algo, name), *args) for name, args in queries]
+            return [f.result() for f in futures]
+
+    def __str__(self):
+        return self._graph.__str__()
@@ -0,0 +1,150 @@
+from DiGraph import DiGraph
+from GraphInterface import GraphInterface
+
+
+def strongly_connected_components(graph: GraphInterface) -> (dict, int):
+    """
+    * Finds all the Strongly Connected Components(SCC) of the graph with an iterative version of Tarjan's algorithm.
+    * The components are numbered in topological order of the condensation DAG, meaning that
+    * every edge between two different components goes from a lower component id to a higher one.
+    @Runtime: O(|V|+|E|).
+    @param graph: The graph
+    @return: A dictionary of {node_id: component_id}, and the number of components
+    """
+    index = dict()  # Discovery order of every node
+    low = dict()  # Lowest discovery order reachable from the node's DFS subtree
+    stack = []
+    on_stack = set()
+    found = dict()  # {node_id: component id in the order the components were found (reverse topological)}
+    counter = 0
+    n_comps = 0
+    for s in graph.get_all_v():
+        if s in index:
+            continue
+        index[s] = low[s] = counter
+        counter += 1
+        stack.append(s)
+        on_stack.add(s)
+        work = [(s, iter(graph.all_out_edges_of_node(s)))]
+        while work:
+            v, neighbors = work[-1]
+            for w in neighbors:
+                if w not in index:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(graph.all_out_edges_of_node(w))))
+                    break
+                elif w in on_stack and index[w] < low[v]:
+                    low[v] = index[w]
+            else:  # All of v's neighbors were processed
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+                if low[v] == index[v]:  # v is the root of a component
+                    while True:
+                        w = stack.pop()
+                        on_stack.discard(w)
+                        found[w] = n_comps
+                        if w == v:
+                            break
+                    n_comps += 1
+    # Tarjan finds the sink components first, flip the numbering into topological order
+    comp = {key: n_comps - 1 - c for key, c in found.items()}
+    return comp, n_comps
+
+
+class Condensation(object):
+    """
+     * This class represents the condensation of a directed graph - the DAG in which every
+     * Strongly Connected Component(SCC) of the graph is contracted into a single vertex.
+     * Components are numbered 0..n-1 in topological order, so every inter-component edge
+     * goes from a lower component id to a higher one, and range(n) is a topological ordering.
+     * comp_of: {node_id: component_id}
+     * components: component_id --> list of the node ids in that component
+     * succ / pred: component_id --> list of the components it has edges to / from (no duplicates)
+    """
+
+    def __init__(self, graph: GraphInterface):
+        self.mc = graph.get_mc()
+        self.comp_of, n_comps = strongly_connected_components(graph)
+        self.components = [[] for _ in range(n_comps)]
+        for key, c in self.comp_of.items():
+            self.components[c].append(key)
+        succ = [dict() for _ in range(n_comps)]  # {component: lightest edge weight}
+        for key, c in self.comp_of.items():
+            for dest, edge in graph.all_out_edges_of_node(key).items():
+                d = self.comp_of[dest]
+                if d != c and edge.weight < succ[c].get(d, float('inf')):
+                    succ[c][d] = edge.weight
+        self._weights = succ
+        self.succ = [list(s) for s in succ]
+        self.pred = [[] for _ in range(n_comps)]
+        for c in range(n_comps):
+            for d in self.succ[c]:
+                self.pred[d].append(c)
+        self._e_size = sum(len(s) for s in self.succ)
+
+    def update_weights(self, graph: GraphInterface, changes: list):
+        """
+        * Keeps the lightest inter-component edge weights up to date after weight updates (the structure does not change).
+        @param graph: The graph the condensation was built from
+        @param changes: A list of (src, dest, old weight, new weight), as reported by DiGraph.subscribe()
+        """
+        for src, dest, old, new in changes:
+            c, d = self.comp_of[src], self.comp_of[dest]
+            if c == d:
+                continue
+            lightest = self._weights[c][d]
+            if new < lightest:
+                self._weights[c][d] = new
+            elif old == lightest:  # The lightest edge got heavier, look for the new lightest one
+                self._weights[c][d] = min(edge.weight for key in self.components[c]
+                                          for e_dest, edge in graph.all_out_edges_of_node(key).items()
+                                          if self.comp_of[e_dest] == d)
+
+    def v_size(self) -> int:
+        """
+        @return: The number of components
+        """
+        return len(self.components)
+
+    def e_size(self) -> int:
+        """
+        @return: The number of edges between the components
+        """
+        return self._e_size
+
+    def topological_order(self) -> list:
+        """
+        @return: The component ids in topological order
+        """
+        return list(range(len(self.components)))
+
+    def sources(self) -> list:
+        """
+        @return: The components with no incoming edges
+        """
+        return [c for c in range(len(self.components)) if len(self.pred[c]) == 0]
+
+    def sinks(self) -> list:
+        """
+        @return: The components with no outgoing edges
+        """
+        return [c for c in range(len(self.components)) if len(self.succ[c]) == 0]
+
+    def to_graph(self) -> DiGraph:
+        """
+        * Builds the condensation as a DiGraph, the node keys are the component ids and
+        * the weight of an edge is the lightest edge between the two components.
+        """
+        ans = DiGraph()
+        for c in range(len(self.components)):
+            ans.add_node(c)
+        for c, weights in enumerate(self._weights):
+            for d, w in weights.items():
+                ans.add_edge(c, d, w)
+        return ans
@@ -0,0 +1,63 @@
+import sys
+from itertools import islice
+
+
+class DegreeIndex(object):
+    """
+     * This class represents a bucketed index of the nodes of a graph by degree (in or out, one index per direction):
+     * {degree: set of the node ids with that degree}. Moving a node between buckets when its degree changes is O(1),
+     * and the buckets are only sorted by degree when queried, and there are few of them - a graph with |E| edges has
+     * at most O(sqrt(|E|)) distinct degrees - so the top-k and histogram queries do not depend on the number of nodes.
+    """
+
+    def __init__(self):
+        self._buckets = {}  # {degree: {node_id}}
+
+    def add(self, key: int, degree: int = 0):
+        bucket = self._buckets.get(degree)
+        if bucket is None:
+            bucket = self._buckets[degree] = set()
+        bucket.add(key)
+
+    def remove(self, key: int, degree: int):
+        bucket = self._buckets[degree]
+        bucket.discard(key)
+        if not bucket:
+            del self._buckets[degree]
+
+    def move(self, key: int, old: int, new: int):
+        """
+        * Moves a node from the bucket of its old degree to the bucket of its new one.
+        """
+        self.remove(key, old)
+        self.add(key, new)
+
+    def top_k(self, k: int) -> list:
+        """
+        @return: Up to k (node_id, degree) pairs of the highest degrees, highest first (ties in no particular order)
+        """
+        ans = []
+        for degree in sorted(self._buckets, reverse=True):
+            if len(ans) >= k:
+                break
+            ans.extend((key, degree) for key in islice(self._buckets[degree], k - len(ans)))
+        return ans
+
+    def histogram(self) -> dict:
+        """
+        @return: A dictionary of {degree: number of nodes}, sorted by degree (degrees with no nodes are left out)
+        """
+        return {degree: len(self._buckets[degree]) for degree in sorted(self._buckets)}
+
+    def memory_usage(self, values=None) -> int:
+        """
+        * Returns an estimate of the memory (bytes) the index takes: the buckets dictionary and sets.
+        @param values: A function that returns the size of the given values (degrees), None to not count them
+        @return: The number of bytes
+        """
+        ans = sys.getsizeof(self._buckets)
+        for degree, bucket in self._buckets.items():
+            ans += sys.getsizeof(bucket)
+            if values is not None:
+                ans += values(degree)
+        return ans
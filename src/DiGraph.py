@@ -1,4 +1,12 @@
+import copy
+import sys
+import weakref
+
+from DegreeIndex import DegreeIndex
 from GraphInterface import GraphInterface
+from GraphSnapshot import GraphSnapshot, MISSING
+from SpatialIndex import SpatialIndex
+from SubGraph import SubGraph
 
 
 class EdgeData(object):
@@ -9,27 +17,33 @@ class EdgeData(object):
     * An edge is one sided on the graph data structure we're running,
     * meaning if there's an edge from src to dest, then not necessarily there's an edge
     * from dest to src.
+    * An info of None stands for "src-->dest", the info of the graph's edges, which is only built when it is read.
     """
 
     def __init__(self, src: int, dest: int, tag: int = 0, info: str = "", weight: float = 0):
         self.src = src
         self.dest = dest
         self.tag = tag
-        self.info = info
+        self._info = info
         self.weight = weight
 
+    @property
+    def info(self) -> str:
+        return f"{self.src}-->{self.dest}" if self._info is None else self._info
+
+    @info.setter
+    def info(self, info: str):
+        self._info = info
+
     def getWeight(self) -> float:
         return self.weight
 
     def __eq__(self, other):
         if other is None:
-            return 1
+            return False
         if not isinstance(other, EdgeData):
-            return 1
-        if self.src == other.src and self.dest == other.dest and self.weight == other.weight:
-            return 0
-        else:
-            return 1
+            return False
+        return self.src == other.src and self.dest == other.dest and self.weight == other.weight
 
     def __repr__(self):
         return "{} ({})".format( self.dest, self.weight)
@@ -43,20 +57,17 @@ class GeoLocation(object):
 
     def __init__(self, location: tuple = None):
         if location is not None:
-            if len(location) == 3:
+            if len(location) >= 2:  # A 2D location lies on z = 0
                 self.x = location[0]
                 self.y = location[1]
-                self.z = location[2]
+                self.z = location[2] if len(location) > 2 else 0
 
     def __eq__(self, other):
         if other is None:
-            return 1
+            return False
         if not isinstance(other, GeoLocation):
-            return 1
-        if self.x == other.x and self.y == other.y and self.z == other.z:
-            return 0
-        else:
-            return 1
+            return False
+        return self.x == other.x and self.y == other.y and self.z == other.z
 
     def distance(self, other):
         """
@@ -96,6 +107,22 @@ class NodeData(object):
         return "{} w:({})".format(self.key, self.weight)
 
 
+_HASH_MASK = (1 << 64) - 1
+
+
+def _node_hash(key: int, location: GeoLocation) -> int:
+    pos = () if location is None else (location.x, location.y, location.z)
+    return hash((0, key, pos)) & _HASH_MASK
+
+
+def _position(location: GeoLocation):
+    return None if location is None else [location.x, location.y, location.z]
+
+
+def _edge_hash(src: int, dest: int, weight: float) -> int:
+    return hash((1, src, dest, weight)) & _HASH_MASK
+
+
 class DiGraph(GraphInterface):
     """
      * This class represents a directed, weighted graph data structure.
@@ -111,27 +138,76 @@ class DiGraph(GraphInterface):
         self.e_size = 0
         self.v_size = 0
         self.mc_size = 0
+        self.spatial_index = SpatialIndex()  # Index over the locations of the nodes
+        self._out_degrees = DegreeIndex()  # Nodes by out degree, see top_k_by_degree()
+        self._in_degrees = DegreeIndex()  # Nodes by in degree
+        self._fingerprint = 0  # Sum of the hashes of all nodes and edges, see fingerprint()
+        self._snapshots = weakref.WeakSet()  # Live snapshots, see snapshot()
+        self._owned_out = set()  # Keys of the out edges dicts that were copied since the last snapshot
+        self._owned_in = set()
+        self._owned_nodes = set()
+        self.journal = None  # A GraphJournal that records every change, see GraphJournal.attach()
+        self._listeners = dict()  # {token: callback or weakref.WeakMethod}, see subscribe()
+        self._next_token = 0
+
+    def __getstate__(self):
+        """
+        * A pickled graph (e.g. sent to a process pool) leaves out its snapshots, subscribers and journal,
+        * which belong to this process.
+        """
+        state = self.__dict__.copy()
+        for name in ("_snapshots", "_listeners", "journal", "_owned_out", "_owned_in", "_owned_nodes"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._snapshots = weakref.WeakSet()
+        self._owned_out = set()
+        self._owned_in = set()
+        self._owned_nodes = set()
+        self.journal = None
+        self._listeners = dict()
 
     def __eq__(self, other):
-        # print("EQ OF DiGraph!")
+        """
+        * Two graphs are equal if they have the same nodes (and positions) and the same weighted edges.
+        * The structural fingerprints are compared first, so graphs that differ are (almost always)
+        * told apart in O(1), only graphs with the same fingerprint are compared node by node.
+        """
         if other is None:
             return False
         if not isinstance(other, DiGraph):
             return False
-
-        if self.v_size != other.v_size or self.e_size != other.e_size or self.mc_size != other.mc_size:
+        if self.v_size != other.v_size or self.e_size != other.e_size or self._fingerprint != other._fingerprint:
             return False
-        are_equal = True
-
-        for key, node in other.get_all_v().items():
-            our_node = self.get_node(key)
-            if node.key == our_node.key:
-                if not our_node.location == node.location:
-                    are_equal = False
-            for e, edge in other.all_out_edges_of_node(key).items():
-                if not edge == self.out_edges.get(key):
-                    are_equal = False
-        return are_equal
+
+        for key, node in self.nodes.items():
+            other_node = other.get_node(key)
+            if other_node is None or node.location != other_node.location:
+                return False
+            other_out = other.all_out_edges_of_node(key)
+            if len(other_out) != len(self.out_edges[key]):
+                return False
+            for dest, edge in self.out_edges[key].items():
+                if edge != other_out.get(dest):
+                    return False
+        return True
+
+    def fingerprint(self) -> int:
+        """
+        * Returns an order independent hash of the nodes, positions and weighted edges of the graph.
+        * It is kept up to date in O(1) by every add/remove of a node or an edge,
+        * so equal graphs always have the same fingerprint, no matter the order they were built in.
+        """
+        return self._fingerprint
+
+    def cache_key(self) -> tuple:
+        """
+        * Returns a hashable key of the current structure of the graph, to be used as a key of caches
+        * that should be shared by equal graphs (the graph itself is mutable, hence not hashable).
+        """
+        return self.v_size, self.e_size, self._fingerprint
 
     def v_size(self) -> int:
         """
@@ -190,14 +266,90 @@ class DiGraph(GraphInterface):
             return False  # If edge (src,dest) did not exist before, increment edgeSize.
         self.e_size += 1
         self.mc_size += 1
-        edge = EdgeData(src=id1, dest=id2, tag=0, info=f"{id1}-->{id2}", weight=weight)
-        self.in_edges[id2][id1] = edge
-        self.out_edges[id1][id2] = edge
+        edge = EdgeData(src=id1, dest=id2, tag=0, info=None, weight=weight)
+        in_edges, out_edges = self._own_in(id2), self._own_out(id1)
+        in_edges[id1] = edge
+        out_edges[id2] = edge
+        self._in_degrees.move(id2, len(in_edges) - 1, len(in_edges))
+        self._out_degrees.move(id1, len(out_edges) - 1, len(out_edges))
+        self._fingerprint = (self._fingerprint + _edge_hash(id1, id2, weight)) & _HASH_MASK
+        if self.journal is not None:
+            self.journal.record("add_edge", src=id1, dest=id2, w=weight)
+        if self._listeners:
+            self._notify([(id1, id2, None, weight)])
         return True
 
     def get_node(self, key):
         return self.nodes.get(key)
 
+    def out_degree(self, key: int) -> int:
+        """
+        @return: The number of edges out of node key (O(1)), -1 if there is no such node
+        """
+        edges = self.out_edges.get(key)
+        return -1 if edges is None else len(edges)
+
+    def in_degree(self, key: int) -> int:
+        """
+        @return: The number of edges into node key (O(1)), -1 if there is no such node
+        """
+        edges = self.in_edges.get(key)
+        return -1 if edges is None else len(edges)
+
+    def top_k_by_degree(self, k: int, direction: str = "out") -> list:
+        """
+        * Returns the k nodes with the highest in or out degree, from a degree index that every change of
+        * the graph keeps up to date in O(1), so the query does not scan the nodes.
+        @param k: The number of nodes
+        @param direction: "out" or "in"
+        @return: A list of up to k (node_id, degree) pairs, highest degree first (ties in no particular order)
+        """
+        return self._degree_index(direction).top_k(k)
+
+    def degree_histogram(self, direction: str = "out") -> dict:
+        """
+        @param direction: "out" or "in"
+        @return: A dictionary of {degree: number of nodes with that degree}, sorted by degree
+        """
+        return self._degree_index(direction).histogram()
+
+    def _degree_index(self, direction: str) -> DegreeIndex:
+        if direction == "out":
+            return self._out_degrees
+        if direction == "in":
+            return self._in_degrees
+        raise ValueError("Unknown direction {}, expected \"out\" or \"in\"".format(direction))
+
+    def set_node_location(self, node_id: int, pos: tuple) -> bool:
+        """
+        * Sets the location of an existing node, and updates the spatial index accordingly (a change of the graph,
+        * so mc grows by one).
+        @param node_id: The node ID
+        @param pos: The new position of the node, None to clear its location
+        @return: True if the location was set, False o.w.
+        """
+        node = self.nodes.get(node_id)
+        if node is None:
+            return False
+        if pos is None and node.location is None:
+            return True  # Nothing to clear
+        if self._snapshots and node_id not in self._owned_nodes:  # Snapshots keep the old node
+            self._preserve_node(node_id)
+            node = copy.copy(node)
+            self.nodes[node_id] = node
+            self._owned_nodes.add(node_id)
+        self._fingerprint = (self._fingerprint - _node_hash(node_id, node.location)) & _HASH_MASK
+        node.location = None if pos is None else GeoLocation(pos)
+        self._fingerprint = (self._fingerprint + _node_hash(node_id, node.location)) & _HASH_MASK
+        if node.location is None:
+            self.spatial_index.remove(node_id)
+        else:
+            self.spatial_index.insert(node_id, node.location)
+        self.mc_size += 1
+        if self.journal is not None:
+            self.journal.record("set_node_location", id=node_id, pos=_position(node.location))
+        return True
+
     def add_node(self, node_id: int, pos: tuple = None) -> bool:
         """
         * adds a new node to the graph with the given node_data.
@@ -208,11 +360,22 @@ class DiGraph(GraphInterface):
         """
         if node_id in self.nodes:
             return False
+        if self._snapshots:
+            self._preserve_node(node_id)
+            self._owned_nodes.add(node_id)
+            self._owned_out.add(node_id)
+            self._owned_in.add(node_id)
         self.nodes[node_id] = NodeData(key=node_id, location=pos)
+        self.spatial_index.insert(node_id, self.nodes[node_id].location)
+        self._fingerprint = (self._fingerprint + _node_hash(node_id, self.nodes[node_id].location)) & _HASH_MASK
         self.out_edges[node_id] = {}
         self.in_edges[node_id] = {}
+        self._out_degrees.add(node_id)
+        self._in_degrees.add(node_id)
         self.v_size += 1
         self.mc_size += 1
+        if self.journal is not None:
+            self.journal.record("add_node", id=node_id, pos=_position(self.nodes[node_id].location))
         return True
 
     def remove_node(self, node_id: int) -> bool:
@@ -225,19 +388,38 @@ class DiGraph(GraphInterface):
         """
         if node_id not in self.nodes:
             return False
-        for i in self.out_edges.keys():
-            if node_id in self.out_edges[i].keys():
-                del self.out_edges[i][node_id]
-                self.e_size -= 1
-        for j in self.in_edges.keys():
-            if node_id in self.in_edges[j].keys():
-                del self.in_edges[j][node_id]
-                self.e_size -= 1
+        self._preserve_node(node_id)
+        fingerprint = self._fingerprint
+        changes = []  # The listeners may change while the node is removed (e.g. by a journal compaction)
+        if self._listeners:
+            changes = [(src, node_id, edge.weight, None) for src, edge in self.in_edges[node_id].items()]
+            changes += [(node_id, dest, edge.weight, None) for dest, edge in self.out_edges[node_id].items()]
+        for src, edge in self.in_edges[node_id].items():  # Only the edges of node_id are visited
+            out_edges = self._own_out(src)
+            del out_edges[node_id]
+            self._out_degrees.move(src, len(out_edges) + 1, len(out_edges))
+            fingerprint -= _edge_hash(src, node_id, edge.weight)
+            self.e_size -= 1
+        for dest, edge in self.out_edges[node_id].items():
+            in_edges = self._own_in(dest)
+            del in_edges[node_id]
+            self._in_degrees.move(dest, len(in_edges) + 1, len(in_edges))
+            fingerprint -= _edge_hash(node_id, dest, edge.weight)
+            self.e_size -= 1
+        self._out_degrees.remove(node_id, len(self.out_edges[node_id]))
+        self._in_degrees.remove(node_id, len(self.in_edges[node_id]))
+        fingerprint -= _node_hash(node_id, self.nodes[node_id].location)
+        self._fingerprint = fingerprint & _HASH_MASK
         self.out_edges.pop(node_id)
         self.in_edges.pop(node_id)
         self.nodes.pop(node_id)
+        self.spatial_index.remove(node_id)
         self.v_size -= 1
         self.mc_size += 1
+        if self.journal is not None:
+            self.journal.record("remove_node", id=node_id)
+        if changes:
+            self._notify(changes)
         return True
 
     def remove_edge(self, node_id1: int, node_id2: int) -> bool:
@@ -250,13 +432,301 @@ class DiGraph(GraphInterface):
         """
         if node_id1 in self.nodes and node_id2 in self.nodes and node_id2 != node_id1:
             if node_id2 in self.out_edges[node_id1] and node_id1 in self.in_edges[node_id2]:
-                del self.out_edges[node_id1][node_id2]
-                del self.in_edges[node_id2][node_id1]
+                weight = self.out_edges[node_id1][node_id2].weight
+                self._fingerprint = (self._fingerprint - _edge_hash(node_id1, node_id2, weight)) & _HASH_MASK
+                out_edges, in_edges = self._own_out(node_id1), self._own_in(node_id2)
+                del out_edges[node_id2]
+                del in_edges[node_id1]
+                self._out_degrees.move(node_id1, len(out_edges) + 1, len(out_edges))
+                self._in_degrees.move(node_id2, len(in_edges) + 1, len(in_edges))
                 self.e_size -= 1
                 self.mc_size += 1
+                if self.journal is not None:
+                    self.journal.record("remove_edge", src=node_id1, dest=node_id2)
+                if self._listeners:
+                    self._notify([(node_id1, node_id2, weight, None)])
                 return True
         return False
 
+    def update_edge_weight(self, id1: int, id2: int, weight: float) -> bool:
+        """
+        * Changes the weight of an existing edge in place (see update_edge_weights()).
+        @param id1: src node of the edge
+        @param id2: dest node of the edge
+        @param weight: The new weight of the edge
+        @return: True if the edge exists and now has the given weight, False o.w.
+        """
+        edge = self.out_edges.get(id1, {}).get(id2)
+        if edge is None or weight < 0:
+            return False
+        self.update_edge_weights([(id1, id2, weight)])
+        return True
+
+    def update_edge_weights(self, updates) -> int:
+        """
+        * Changes the weights of many existing edges in place, as a single change of the graph:
+        * mc grows by one for the whole batch, the edges keep their EdgeData (unless a snapshot still shares them,
+        * then the edge is replaced as in copy-on-write), and the subscribers are notified once with all the changes.
+        * Updates of missing edges or with a negative weight are skipped, as well as updates that do not change the weight.
+        @param updates: An iterable of (src, dest, weight)
+        @return: The number of edges whose weight was changed
+        """
+        changes = []
+        fingerprint = self._fingerprint
+        for id1, id2, weight in updates:
+            edge = self.out_edges.get(id1, {}).get(id2)
+            if edge is None or weight < 0 or edge.weight == weight:
+                continue
+            old = edge.weight
+            fingerprint += _edge_hash(id1, id2, weight) - _edge_hash(id1, id2, old)
+            if self._snapshots:  # The snapshots keep the old EdgeData
+                edge = copy.copy(edge)
+                self._own_out(id1)[id2] = edge
+                self._own_in(id2)[id1] = edge
+            edge.weight = weight
+            changes.append((id1, id2, old, weight))
+        if not changes:
+            return 0
+        self._fingerprint = fingerprint & _HASH_MASK
+        self.mc_size += 1
+        if self.journal is not None:
+            self.journal.record("update_edge_weights", edges=[[id1, id2, new] for id1, id2, old, new in changes])
+        if self._listeners:
+            self._notify(changes)
+        return len(changes)
+
+    def add_nodes_from(self, ids, positions=None) -> int:
+        """
+        * Adds many nodes as a single change of the graph (mc grows by one for the whole batch),
+        * the bulk construction path of the importers (see GraphFormats). Nodes that already exist are skipped.
+        @param ids: An iterable of node ids
+        @param positions: An iterable of the positions (tuple or None) of the nodes, in the order of ids (None - no positions)
+        @return: The number of nodes that were added
+        """
+        if self._snapshots or self.journal is not None:
+            added = 0
+            for key, pos in zip(ids, positions) if positions is not None else ((key, None) for key in ids):
+                added += self.add_node(key, pos)
+            return added
+        nodes, out_edges, in_edges = self.nodes, self.out_edges, self.in_edges
+        fingerprint = self._fingerprint
+        added = []
+        for key, pos in zip(ids, positions) if positions is not None else ((key, None) for key in ids):
+            if key in nodes:
+                continue
+            node = nodes[key] = NodeData(key=key, location=pos)
+            if pos is not None:
+                self.spatial_index.insert(key, node.location)
+            fingerprint += _node_hash(key, node.location)
+            out_edges[key] = {}
+            in_edges[key] = {}
+            added.append(key)
+        if not added:
+            return 0
+        for key in added:
+            self._out_degrees.add(key)
+            self._in_degrees.add(key)
+        self._fingerprint = fingerprint & _HASH_MASK
+        self.v_size += len(added)
+        self.mc_size += 1
+        return len(added)
+
+    def add_edges_from(self, src, dest, weights) -> int:
+        """
+        * Adds many edges as a single change of the graph (mc grows by one for the whole batch, the subscribers
+        * are notified once), the bulk construction path of the importers (see GraphFormats).
+        * Edges are skipped as by add_edge: missing nodes, self loops, negative weights and edges that already exist.
+        * The degree indexes are rebuilt once at the end instead of moving a node per edge.
+        @param src: An iterable of the sources of the edges
+        @param dest: An iterable of the destinations of the edges, in the same order
+        @param weights: An iterable of the weights of the edges, in the same order
+        @return: The number of edges that were added
+        """
+        if self._snapshots or self.journal is not None:
+            added = 0
+            for id1, id2, weight in zip(src, dest, weights):
+                added += self.add_edge(id1, id2, weight)
+            return added
+        out_edges, in_edges = self.out_edges, self.in_edges
+        fingerprint = 0
+        changes = [] if self._listeners else None
+        added = 0
+        for id1, id2, weight in zip(src, dest, weights):
+            if id1 == id2 or weight < 0:
+                continue
+            out = out_edges.get(id1)
+            into = in_edges.get(id2)
+            if out is None or into is None or id2 in out:
+                continue
+            edge = EdgeData(id1, id2, 0, None, weight)
+            out[id2] = edge
+            into[id1] = edge
+            fingerprint += hash((1, id1, id2, weight))  # _edge_hash, masked once for the whole batch
+            added += 1
+            if changes is not None:
+                changes.append((id1, id2, None, weight))
+        if not added:
+            return 0
+        self._out_degrees = DegreeIndex()
+        self._in_degrees = DegreeIndex()
+        for key in self.nodes:
+            self._out_degrees.add(key, len(out_edges[key]))
+            self._in_degrees.add(key, len(in_edges[key]))
+        self._fingerprint = (self._fingerprint + fingerprint) & _HASH_MASK
+        self.e_size += added
+        self.mc_size += 1
+        if changes:
+            self._notify(changes)
+        return added
+
+    def subscribe(self, callback, weak: bool = False) -> int:
+        """
+        * Registers a callback that is called after every change of the edges of the graph, as
+        * callback(graph, changes), where changes is a list of (src, dest, old weight, new weight):
+        * an added edge has old weight None, a removed edge (also by remove_node) has new weight None,
+        * and an edge whose weight was updated has both. A batch of weight updates is reported in a single call.
+        @param callback: The callback
+        @param weak: True to hold a bound method callback by a weak reference,
+        *            so subscribing does not keep its object alive (it is unsubscribed once the object is gone)
+        @return: A token for unsubscribe()
+        """
+        token = self._next_token
+        self._next_token += 1
+        self._listeners[token] = weakref.WeakMethod(callback) if weak else callback
+        return token
+
+    def unsubscribe(self, token: int) -> bool:
+        """
+        @return: True if the token was subscribed, False o.w.
+        """
+        return self._listeners.pop(token, None) is not None
+
+    def _notify(self, changes: list):
+        for token, callback in list(self._listeners.items()):
+            if isinstance(callback, weakref.WeakMethod):
+                callback = callback()
+                if callback is None:
+                    self._listeners.pop(token, None)
+                    continue
+            callback(self, changes)
+
+    def memory_usage(self, deep: bool = True) -> dict:
+        """
+        * Returns an estimate of the memory (bytes) this graph takes, broken down by kind:
+        * nodes - NodeData objects, locations - GeoLocation objects, edges - EdgeData objects,
+        * info - the info strings of nodes and edges, nodes_table / out_edges / in_edges - the dictionaries,
+        * spatial_index - the index of the locations (points and cells), degrees - the buckets of the two degree indexes,
+        * total - the sum of the above, and compact - what the same graph would take in an array form
+        * (int64 ids, float64 positions and two CSR tables of int64 indices and float64 weights).
+        * An object counts as its header plus one pointer per attribute.
+        @param deep: True to also count the values held by the objects (info strings, numbers),
+        *            every value is counted once, even if it is shared by a few objects
+        @return: A dictionary of {kind: bytes}
+        """
+        seen = set()
+
+        def values(*objs):  # Sizes of values that are not cached/shared by the interpreter
+            size = 0
+            for v in objs:
+                if v is None or isinstance(v, bool) or (isinstance(v, int) and -5 <= v <= 256) or id(v) in seen:
+                    continue
+                seen.add(id(v))
+                size += sys.getsizeof(v)
+            return size
+
+        ans = {"nodes": 0, "locations": 0, "edges": 0, "info": 0, "nodes_table": sys.getsizeof(self.nodes),
+               "out_edges": sys.getsizeof(self.out_edges), "in_edges": sys.getsizeof(self.in_edges)}
+        located = 0
+        for key, node in self.nodes.items():
+            ans["nodes"] += sys.getsizeof(node) + 8 * 5  # key, tag, info, weight, location
+            if deep:
+                ans["nodes"] += values(node.key, node.tag, node.weight)
+                ans["info"] += values(node.info)
+            if node.location is not None:
+                located += 1
+                ans["locations"] += sys.getsizeof(node.location) + 8 * 3
+                if deep:
+                    ans["locations"] += values(node.location.x, node.location.y, node.location.z)
+            ans["out_edges"] += sys.getsizeof(self.out_edges[key])
+            ans["in_edges"] += sys.getsizeof(self.in_edges[key])
+            for edge in self.out_edges[key].values():
+                ans["edges"] += sys.getsizeof(edge) + 8 * 5  # src, dest, tag, info, weight
+                if deep:
+                    ans["edges"] += values(edge.src, edge.dest, edge.tag, edge.weight)
+                    ans["info"] += values(edge._info)  # A None info is built on read, it takes no memory
+        ans["spatial_index"] = self.spatial_index.memory_usage(values if deep else None)
+        ans["degrees"] = (self._out_degrees.memory_usage(values if deep else None)
+                          + self._in_degrees.memory_usage(values if deep else None))
+        ans["total"] = sum(ans.values())
+        v, e = len(self.nodes), self.e_size
+        ans["compact"] = 8 * v + 24 * located + 2 * (8 * (v + 1) + 8 * e + 8 * e)
+        return ans
+
+    def snapshot(self) -> GraphSnapshot:
+        """
+        * Returns a read only view of the graph as it is now (pinned to the current mc), in O(1).
+        * The view shares the graph's dictionaries, and the graph copies a node or an adjacency dictionary
+        * only when it changes it for the first time after the snapshot (copy-on-write),
+        * so a snapshot costs memory only for what was changed after it was taken.
+        @return: A GraphSnapshot of the graph
+        """
+        snap = GraphSnapshot(self)
+        self._snapshots.add(snap)
+        self._owned_out = set()  # Everything is shared with the new snapshot
+        self._owned_in = set()
+        self._owned_nodes = set()
+        return snap
+
+    def subgraph(self, node_ids) -> SubGraph:
+        """
+        * Returns the subgraph induced by the given nodes (the nodes and the edges between them) as a live,
+        * read only view of this graph, in O(1): the adjacency dictionaries are filtered on access, not copied.
+        @param node_ids: The node ids of the subgraph (a set is used as is, other iterables are turned into one)
+        @return: A SubGraph view
+        """
+        return SubGraph(self, node_ids)
+
+    def _own_out(self, key: int) -> dict:
+        """
+        * Returns the out edges dictionary of node key, after making sure it is not shared with a snapshot.
+        """
+        edges = self.out_edges[key]
+        if self._snapshots and key not in self._owned_out:
+            for snap in list(self._snapshots):
+                snap._out.setdefault(key, edges)
+            edges = dict(edges)
+            self.out_edges[key] = edges
+            self._owned_out.add(key)
+        return edges
+
+    def _own_in(self, key: int) -> dict:
+        """
+        * Returns the in edges dictionary of node key, after making sure it is not shared with a snapshot.
+        """
+        edges = self.in_edges[key]
+        if self._snapshots and key not in self._owned_in:
+            for snap in list(self._snapshots):
+                snap._in.setdefault(key, edges)
+            edges = dict(edges)
+            self.in_edges[key] = edges
+            self._owned_in.add(key)
+        return edges
+
+    def _preserve_node(self, key: int):
+        """
+        * Hands the current node key (and its adjacency dictionaries) over to all the live snapshots
+        * that do not hold their own version of it yet, before the node is added, removed or replaced.
+        """
+        if not self._snapshots:
+            return
+        node = self.nodes.get(key, MISSING)
+        out_edges = self.out_edges.get(key, MISSING)
+        in_edges = self.in_edges.get(key, MISSING)
+        for snap in list(self._snapshots):
+            snap._nodes.setdefault(key, node)
+            snap._out.setdefault(key, out_edges)
+            snap._in.setdefault(key, in_edges)
+
     def __repr__(self):
         s = "Graph info:\n|V|={} , |E|={} , MC={}\n".format(self.v_size, self.e_size, self.mc_size)
         for key in self.nodes.keys():
@@ -1,13 +1,58 @@
-import json
+import heapq
+import os
 import random
+import threading
+import time
+from array import array
 
 import matplotlib.pyplot as plt
 from typing import List
 
 from GraphAlgoInterface import GraphAlgoInterface
-from DiGraph import DiGraph, GeoLocation
+from DiGraph import DiGraph
+from Condensation import Condensation
+import GraphFormats
 from GraphInterface import GraphInterface
+from PathResult import PathResult
+from QueryBudget import QueryBudget
+from ReachabilityIndex import ReachabilityIndex
+from SubGraph import SubGraph
 from queue import Queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+_worker_adjacency = None  # {key: [(dest, weight), ..]} of the graph, in every process of a tsp() pool
+_TSP_POOL_MIN_STOPS = 16  # Fewer stops are searched in this process, a pool costs more than it saves
+_TSP_GREEDY_SHARE = 0.25  # The part of the tsp() time budget the greedy starts may use, the rest is for 2-opt/Or-opt
+
+
+def _init_distance_worker(adjacency: dict):
+    global _worker_adjacency
+    _worker_adjacency = adjacency
+
+
+def _distances_from(src: int, targets: list) -> list:
+    """
+    * Dijkstra from src over the worker's adjacency, stopped once all the targets were settled.
+    @return: The distances from src to every target (inf if unreachable), in the order of targets
+    """
+    remaining = set(targets)
+    dist = {src: 0.0}
+    settled = set()
+    heap = [(0.0, src)]
+    while heap and remaining:
+        d, key = heapq.heappop(heap)
+        if key in settled:
+            continue
+        settled.add(key)
+        remaining.discard(key)
+        for dest, w in _worker_adjacency[key]:
+            nd = d + w
+            if dest not in settled and nd < dist.get(dest, float('inf')):
+                dist[dest] = nd
+                heapq.heappush(heap, (nd, dest))
+    return [dist[t] if t in settled else float('inf') for t in targets]
 
 
 class GraphAlgo(GraphAlgoInterface):
@@ -19,11 +64,52 @@ class GraphAlgo(GraphAlgoInterface):
      checking if the graph is strongly connected, and so on...
     """
 
-    def __init__(self, directed_graph: object = None): # TODO: should be change
+    def __init__(self, directed_graph: object = None, sparse: bool = False): # TODO: should be change
         self._graph = DiGraph()
         if directed_graph is not None:
-            if isinstance(directed_graph, DiGraph):
+            if isinstance(directed_graph, GraphInterface):  # A DiGraph or a read only view of one
                 self._graph = directed_graph
+        self.sparse = sparse  # True --> traversals run on a vectorized sparse matrix form of the graph (numpy & scipy)
+        self._cache_lock = threading.RLock()  # Guards the cached structures below when queries run on many threads
+        self._reset_caches()
+        self._watch()
+
+    def _reset_caches(self):
+        """
+        * Drops all the structures that were built over the graph (they are rebuilt on demand).
+        """
+        self._sparse_graph = None
+        self._reachability = None
+        self._condensation = None
+
+    def _watch(self):
+        """
+        * Subscribes to the edge changes of the graph (if it is a DiGraph), so weight updates
+        * patch the cached structures instead of dropping them.
+        """
+        if isinstance(self._graph, DiGraph):
+            self._graph.subscribe(self._on_edges_changed, weak=True)
+
+    def _on_edges_changed(self, graph: DiGraph, changes: list):
+        """
+        * Keeps the cached structures valid across a batch of weight updates (DiGraph.update_edge_weights()):
+        * the reachability index does not depend on the weights, and the condensation's lightest edges
+        * and the sparse form are patched in place.
+        * A structure is kept only if it was up to date right before the batch (mc - 1).
+        * Added or removed edges change the structure, so the caches are left to be rebuilt by mc.
+        """
+        if graph is not self._graph or any(old is None or new is None for src, dest, old, new in changes):
+            return
+        with self._cache_lock:
+            mc = graph.get_mc()
+            if self._condensation is not None and self._condensation.mc == mc - 1:
+                self._condensation.update_weights(graph, changes)
+                self._condensation.mc = mc
+            if self._reachability is not None:
+                self._reachability.mark_current(mc)
+            if self._sparse_graph is not None and self._sparse_graph.mc == mc - 1:
+                self._sparse_graph.update_weights(changes)
+                self._sparse_graph.mc = mc
 
     def get_graph(self) -> GraphInterface:
         """
@@ -37,122 +123,174 @@ class GraphAlgo(GraphAlgoInterface):
         @param file_name: The path to the json file
         @returns: True if the loading was successful, False o.w.
         """
-        flag = True
+        return self._load(GraphFormats.read_json, file_name)
+
+    def save_to_json(self, file_name: str) -> bool:
+        """
+        Saves the graph in JSON format to a file
+        @param file_name: The path to the out file
+        @return: True if the save was successful, False o.w.
+        """
         try:
-            with open(file_name, 'r') as jsonFile:
-                load = json.load(jsonFile)
-                graphJson = DiGraph()
-            for node in load["Nodes"]:
-                if "pos" in node:
-                    posJ = tuple(map(float, str(node["pos"]).split(",")))
-                    graphJson.add_node(node_id=node["id"], pos=posJ)
-                else:
-                    graphJson.add_node(node_id=node["id"])
-            for edge in load["Edges"]:
-                graphJson.add_edge(id1=edge["src"], id2=edge["dest"], weight=edge["w"])
-            self._graph = graphJson
-            # print("load successes")
+            GraphFormats.write_json(self._graph, file_name)
         except Exception as e:
+            print("Save Json was failed ")
             print(e)
-            print("load failed")
-            flag = False
-        finally:
-            return flag
+            return False
+        return True
 
-    def save_to_json(self, file_name: str) -> bool:
+    def load_from_edge_list(self, file_name: str) -> bool:
         """
-        Saves the graph in JSON format to a file
+        Loads a graph from a whitespace separated edge list ("src dest [weight]" lines, see GraphFormats).
+        @param file_name: The path to the file
+        @returns: True if the loading was successful, False o.w.
+        """
+        return self._load(GraphFormats.read_edge_list, file_name)
+
+    def save_to_edge_list(self, file_name: str) -> bool:
+        """
+        Saves the graph as a whitespace separated edge list (the positions of the nodes are not saved).
         @param file_name: The path to the out file
         @return: True if the save was successful, False o.w.
         """
-        flag = True
-        with open(file_name, "w") as jsonFile:
-            try:
-                d = {"Edges": [], "Nodes": []}
-                for src in self._graph.out_edges.keys():
-                    for dst, w in self._graph.all_out_edges_of_node(src).items():
-                        d["Edges"].append({"src": src, "w": w.weight, "dest": dst})
-                for key, value in self._graph.nodes.items():
-                    if value.location is None:
-                        d["Nodes"].append({"id": key})
-                    else:
-                        d["Nodes"].append({"pos": str(value.location), "id": key})
-                s = d.__str__()
-                s = s.replace(" ", "")
-                s = s.replace("'", "\"")
-                jsonFile.write(s)
-                # print("Save Json was succeeded ")
-            except Exception as e:
-                print("Save Json was failed ")
-                print(e)
-                flag = False
-            finally:
-                return flag
-
-    def shortest_path(self, id1: int, id2: int) -> (float, list):
+        return self._save(GraphFormats.write_edge_list, file_name)
+
+    def load_from_mtx(self, file_name: str) -> bool:
+        """
+        Loads a graph from a Matrix Market coordinate file (entry (i, j, w) is the edge i-1 -> j-1, see GraphFormats).
+        @param file_name: The path to the .mtx file
+        @returns: True if the loading was successful, False o.w.
+        """
+        return self._load(GraphFormats.read_mtx, file_name)
+
+    def save_to_mtx(self, file_name: str) -> bool:
+        """
+        Saves the graph as a Matrix Market coordinate file (the node ids must not be negative,
+        the positions of the nodes are not saved).
+        @param file_name: The path to the out file
+        @return: True if the save was successful, False o.w.
+        """
+        return self._save(GraphFormats.write_mtx, file_name)
+
+    def _load(self, read, file_name: str) -> bool:
+        try:
+            self._graph = read(file_name)
+            self._reset_caches()
+            self._watch()
+        except Exception as e:
+            print(e)
+            print("load failed")
+            return False
+        return True
+
+    def _save(self, write, file_name: str) -> bool:
+        try:
+            write(self._graph, file_name)
+        except Exception as e:
+            print("Save was failed ")
+            print(e)
+            return False
+        return True
+
+    def shortest_path(self, id1: int, id2: int, budget: QueryBudget = None) -> PathResult:
         """
         * returns the the shortest path between src to dest - as an ordered List of nodes:
         * src--> n1-->n2-->...dest
+        * The result is a PathResult, a (distance, list of nodes) tuple backed by arrays of the ids and the cumulative
+        * distances along the path (result.ids / result.distances), the nodes are only created when they are read.
         * Logic only was taken from: https://en.wikipedia.org/wiki/Shortest_path_problem
         * Note if no such path --> returns null;
-        @Runtime: Regular BFS using a priority queue = O(|V|+|E|).
+        @Runtime: Dijkstra using a binary heap = O((|V|+|E|)log|V|).
         @param id1  - start node
         @param id2 - end (target) node
+        @param budget - an optional QueryBudget, if it runs out before dest was reached --> (inf, []) and budget.incomplete
         @return - the path between src and dest if there is one.
         """
 
         # Edge cases
         # Either one of the nodes does not exist in the graph.
         if id1 not in self._graph.get_all_v() or id2 not in self._graph.get_all_v():
-            return float('inf'), []
+            return PathResult(self._graph, array('q'), array('d'), float('inf'))
         if id1 == id2:  # The path from a node to itself is empty and the total distance is 0
-            return 0, []
-
-        # Initialization
-        src = id1
-        dest = id2
-
-        self.reset_tags()
-        self.set_weights_infinity()
-
-        prev_node = dict()  # A map that stores: {key(int): caller(Node)} (Which node called which)
-        pq = Queue()  # A queue to prioritize nodes with lower weight
-        visited = dict()  # Keep track of visited nodes
-
-        total_dist = 0.0
-        destination_found = False
-        curr = self._graph.get_node(src)
-        curr.weight = total_dist
-        visited[curr.key] = True
-
-        pq.put(curr)
-
-        # Traverse
-        while not pq.empty():
-            curr = pq.get()  # Pop the next node with the lowest weight O(log(n))
-            neighbors = self._graph.all_out_edges_of_node(curr.key)  # Neighbors of curr node
-            for i in neighbors:  # Iterate over neighbors of curr
-                out_edge = neighbors[i]  # out_edge: EdgeData
-                neighbor = self._graph.get_node(out_edge.dest)  # neighbor: NodeData
-                if not visited.get(neighbor.key):  # Process node if not visited
-                    total_dist = curr.weight + out_edge.weight
-                    if total_dist < neighbor.weight:
-                        neighbor.weight = total_dist
-                        prev_node.__setitem__(neighbor.key, curr)
-                    if neighbor not in pq.queue:  # If not already in the queue, enqueue neighbor.
-                        pq.put(neighbor)
-            # Finished processing curr's neighbors
-            if curr.key == dest:
-                destination_found = True
-            visited[curr.key] = True
-
-        if destination_found:
-            path = self.rebuild_path(prev_node, src, dest)  # A list of nodes that represents the path between id1->id2
-
-            total_dist = path[len(path) - 1].weight
-            return total_dist, path
-
-        return float('inf'), []
+            return PathResult(self._graph, array('q'), array('d'), 0)
+
+        # Traverse: Dijkstra with a binary heap, stopped once dest was settled.
+        # All the state is local, so the graph's nodes are never written (safe for concurrent readers).
+        prev_node = dict()  # A map that stores: {key(int): caller key(int)} (Which node called which)
+        dist = dict()  # {key(int): distance from id1}
+        hops = {None: -1}  # {key(int): number of edges on its shortest path}
+        for key, d, prev in self._dijkstra_iter(id1, budget=budget):
+            prev_node[key] = prev
+            dist[key] = d
+            hops[key] = hops[prev] + 1
+            if key == id2:
+                return self._path_result(prev_node, dist, hops[key] + 1, id2)
+
+        return PathResult(self._graph, array('q'), array('d'), float('inf'))
+
+    def multi_source_shortest_paths(self, sources: list, reverse: bool = False,
+                                    budget: QueryBudget = None) -> (dict, dict, dict):
+        """
+        * Finds the nearest source of every node with a single Dijkstra seeded with all the sources at distance 0,
+        * in O((|V|+|E|)log|V|) no matter how many sources there are (instead of one shortest_path per node and source).
+        * A node at the same distance from a few sources is assigned to one of them.
+        @param sources: The source node ids (ids that are not in the graph are ignored)
+        @param reverse: True to run over the in edges, i.e. find for every node the nearest source that it can reach
+        *               (then the "previous" node of a node is the next node on its path to that source)
+        @param budget: An optional QueryBudget, if it runs out only the nodes settled so far have their final values
+        @return: Three dictionaries over all the nodes of the graph - {node_id: distance to the nearest source},
+        *        {node_id: the nearest source} and {node_id: the previous node on the path from it},
+        *        (inf, None, None) for nodes that no source reaches, (0, itself, None) for the sources
+        """
+        nodes = self._graph.get_all_v()
+        edges_of = self._graph.all_in_edges_of_node if reverse else self._graph.all_out_edges_of_node
+        dist = dict.fromkeys(nodes, float('inf'))
+        nearest = dict.fromkeys(nodes)
+        prev_node = dict.fromkeys(nodes)
+        heap = []
+        counter = 0
+        for src in sources:
+            if src in nodes:
+                heap.append((0.0, counter, src, None, src))  # (distance, tie breaker, key, previous key, source)
+                counter += 1
+        heapq.heapify(heap)
+        settled = set()
+        while heap:
+            d, _, key, prev, origin = heapq.heappop(heap)
+            if key in settled:
+                continue
+            if budget is not None and not budget.spend():
+                for key in nodes:  # Drop the tentative distances of the unsettled nodes
+                    if key not in settled:
+                        dist[key] = float('inf')
+                break
+            settled.add(key)
+            dist[key] = d
+            nearest[key] = origin
+            prev_node[key] = prev
+            for dest, edge in edges_of(key).items():
+                if dest in settled:
+                    continue
+                nd = d + edge.weight
+                if nd < dist[dest]:
+                    dist[dest] = nd
+                    heapq.heappush(heap, (nd, counter, dest, key, origin))
+                    counter += 1
+        return dist, nearest, prev_node
+
+    def _path_result(self, prev_node: dict, dist: dict, length: int, dest: int) -> PathResult:
+        """
+        * Back-tracks from dest over prev_node, filling the arrays of the path (of the given number of nodes)
+        * from the end, so the path is built in one pass with no reversing.
+        """
+        ids = array('q', bytes(8 * length))
+        distances = array('d', bytes(8 * length))
+        key = dest
+        for i in range(length - 1, -1, -1):
+            ids[i] = key
+            distances[i] = dist[key]
+            key = prev_node[key]
+        return PathResult(self._graph, ids, distances)
 
     def rebuild_path(self, node_map: dict = None, src: int = 0, dest: int = 0) -> list:
         """
@@ -164,15 +302,323 @@ class GraphAlgo(GraphAlgoInterface):
         ans = [self._graph.get_node(dest)]
         next_node = node_map.get(dest)
         ans.append(next_node)
-        while next_node.key is not src:  # Backtrack from dest to src
+        while next_node.key != src:  # Backtrack from dest to src
             ans.append(node_map.get(next_node.key))
             next_node = node_map.get(next_node.key)
-        if self._graph.get_node(src) not in ans:
+        if ans[-1].key != src:
             ans.append(self._graph.get_node(src))
 
         ans.reverse()  # Inserted from
         return ans
 
+    def within_distance(self, src: int, radius: float, budget: QueryBudget = None):
+        """
+        * Lazily yields every node reachable from src whose shortest path distance is at most radius.
+        * The search is a truncated Dijkstra, it stops as soon as the next closest node is farther than radius,
+        * so only the explored region of the graph is touched (node tags and weights are left untouched).
+        * Note: src itself is not yielded. If src is not in the graph or radius < 0 nothing is yielded.
+        @param src: The start node id
+        @param radius: The maximal distance from src
+        @param budget: An optional QueryBudget, if it runs out the generator stops early (and budget.incomplete is set)
+        @return: A generator of (node_id, distance) pairs, ordered by distance
+        """
+        if src not in self._graph.get_all_v() or radius < 0:
+            return
+        for key, dist, prev in self._dijkstra_iter(src, budget=budget):
+            if dist > radius:
+                return
+            if key != src:
+                yield key, dist
+
+    def k_nearest(self, src: int, k: int, budget: QueryBudget = None):
+        """
+        * Lazily yields the k closest nodes that are reachable from src.
+        * The search is a truncated Dijkstra that stops after the k-th node was settled.
+        * Note: src itself is not yielded. If src is not in the graph or k <= 0 nothing is yielded.
+        @param src: The start node id
+        @param k: The number of nodes to yield
+        @param budget: An optional QueryBudget, if it runs out the generator stops early (and budget.incomplete is set)
+        @return: A generator of (node_id, distance) pairs, ordered by distance
+        """
+        if src not in self._graph.get_all_v() or k <= 0:
+            return
+        found = 0
+        for key, dist, prev in self._dijkstra_iter(src, budget=budget):
+            if key == src:
+                continue
+            yield key, dist
+            found += 1
+            if found == k:
+                return
+
+    def k_shortest_paths(self, src: int, dest: int, k: int, budget: QueryBudget = None):
+        """
+        * Lazily yields the k shortest loopless paths from src to dest, ordered by cost (Yen's algorithm).
+        * Every next path deviates from one of the paths found so far at some spur node: the spur search runs
+        * with the root path's nodes and the already used deviation edges masked (nothing is copied), and is an
+        * A* search guided by the distances to dest on the reverse shortest path tree of dest, which is built once.
+        * Since masking only removes edges, these distances never overestimate, and nodes that cannot reach
+        * dest at all are never expanded.
+        @param src: The start node id
+        @param dest: The end node id
+        @param k: The maximal number of paths
+        @param budget: An optional QueryBudget, if it runs out the generator stops after the paths found so far
+        *              (which are still the shortest ones, in order) and budget.incomplete is set
+        @return: A generator of (cost, [node ids]) pairs
+        """
+        if src not in self._graph.get_all_v() or dest not in self._graph.get_all_v() or k <= 0 or src == dest:
+            return
+        # Reverse shortest path tree
+        to_dest = {key: d for key, d, prev in self._dijkstra_iter(dest, reverse=True, budget=budget)}
+        if src not in to_dest or (budget is not None and budget.incomplete):
+            return
+        found = []  # [(path, cumulative costs)]
+        first = self._spur_search(src, dest, to_dest, set(), set(), budget)
+        if first is None:  # The budget ran out
+            return
+        candidates = [(first[0][-1], 0, first)]  # Heap of (cost, tie breaker, (path, cumulative costs))
+        seen = {tuple(first[1])}
+        counter = 1
+        while candidates and len(found) < k and (budget is None or not budget.incomplete):
+            cost, _, (costs, path) = heapq.heappop(candidates)
+            found.append((path, costs))
+            yield cost, path
+            if len(found) == k:
+                return
+            for i in range(len(path) - 1):  # Every node on the last path (but dest) is a spur node
+                root = path[:i + 1]
+                masked_edges = {(p[i], p[i + 1]) for p, c in found if len(p) > i + 1 and p[:i + 1] == root}
+                spur = self._spur_search(path[i], dest, to_dest, set(root[:-1]), masked_edges, budget)
+                if budget is not None and budget.incomplete:
+                    return  # A candidate may be missing, the next path is not known for sure
+                if spur is None:
+                    continue
+                spur_costs, spur_path = spur
+                new_path = root + spur_path[1:]
+                if tuple(new_path) in seen:
+                    continue
+                seen.add(tuple(new_path))
+                new_costs = costs[:i + 1] + [costs[i] + c for c in spur_costs[1:]]
+                heapq.heappush(candidates, (new_costs[-1], counter, (new_costs, new_path)))
+                counter += 1
+
+    def _spur_search(self, src: int, dest: int, to_dest: dict, masked_nodes: set, masked_edges: set,
+                     budget: QueryBudget = None):
+        """
+        * A* search from src to dest, that skips the masked nodes and edges.
+        @param to_dest: The distance from every node to dest (a lower bound of the masked distance)
+        @return: (cumulative costs, [node ids]) of the path found, None if there is no such path (or the budget ran out)
+        """
+        dist = {src: 0.0}
+        prev_node = {src: None}
+        settled = set()
+        heap = [(to_dest[src], 0, src)]
+        counter = 1
+        while heap:
+            f, _, key = heapq.heappop(heap)
+            if key in settled:
+                continue
+            if budget is not None and not budget.spend():
+                return None
+            if key == dest:
+                path = []
+                while key is not None:
+                    path.append(key)
+                    key = prev_node[key]
+                path.reverse()
+                return [dist[p] for p in path], path
+            settled.add(key)
+            for neighbor, edge in self._graph.all_out_edges_of_node(key).items():
+                if neighbor in settled or neighbor in masked_nodes or neighbor not in to_dest \
+                        or (key, neighbor) in masked_edges:
+                    continue
+                nd = dist[key] + edge.weight
+                if nd < dist.get(neighbor, float('inf')):
+                    dist[neighbor] = nd
+                    prev_node[neighbor] = key
+                    heapq.heappush(heap, (nd + to_dest[neighbor], counter, neighbor))
+                    counter += 1
+        return None
+
+    def tsp(self, cities: list, time_budget: float = 1.0, workers: int = None) -> (float, list):
+        """
+        * Finds a cheap order to visit all the given nodes (stops), and the path through the graph that visits them in it.
+        * 1. The stop-to-stop distance matrix is built with one single source Dijkstra per stop,
+        *    run on a process pool (every process gets the graph's adjacency once) when there are many stops.
+        * 2. A greedy (nearest neighbor) order is built from as many starts as _TSP_GREEDY_SHARE of the time budget
+        *    allows, and improved by 2-opt and Or-opt moves until no move helps or the time budget runs out.
+        * 3. The order is expanded into a node path with a shortest path between every two consecutive stops.
+        * Note: the order is an open path (it does not return to the first stop), the distances may be asymmetric.
+        @param cities: The node ids to visit
+        @param time_budget: Seconds for the ordering heuristics
+        @param workers: The number of processes (if None: os.cpu_count(), or no pool under _TSP_POOL_MIN_STOPS stops),
+        *               1 --> no pool
+        @return: The total cost and the list of node ids of the path, (inf, []) if no such path
+        """
+        stops = list(dict.fromkeys(cities))  # Drop duplicates, keep the order
+        if len(stops) == 0 or any(self._graph.get_node(c) is None for c in stops):
+            return float('inf'), []
+        if len(stops) == 1:
+            return 0, stops
+
+        matrix = self._distance_matrix(stops, workers)
+        start = time.perf_counter()
+        deadline = start + time_budget
+        order = self._greedy_order(matrix, start + time_budget * _TSP_GREEDY_SHARE)
+        order = self._improve_order(matrix, order, deadline)
+        cost = sum(matrix[order[i]][order[i + 1]] for i in range(len(order) - 1))
+        if cost == float('inf'):
+            return float('inf'), []
+
+        path = [stops[order[0]]]
+        for i in range(len(order) - 1):
+            src, dest = stops[order[i]], stops[order[i + 1]]
+            prev_node = {}
+            for key, d, prev in self._dijkstra_iter(src):
+                prev_node[key] = prev
+                if key == dest:
+                    break
+            leg = []
+            key = dest
+            while key != src:
+                leg.append(key)
+                key = prev_node[key]
+            leg.reverse()
+            path.extend(leg)
+        return cost, path
+
+    def _distance_matrix(self, stops: list, workers: int = None) -> list:
+        """
+        * Builds the stop-to-stop distance matrix, with one single source search per stop.
+        """
+        adjacency = {key: [(dest, edge.weight) for dest, edge in self._graph.all_out_edges_of_node(key).items()]
+                     for key in self._graph.get_all_v()}
+        if workers is None:
+            workers = (os.cpu_count() or 1) if len(stops) >= _TSP_POOL_MIN_STOPS else 1
+        if workers <= 1:
+            _init_distance_worker(adjacency)
+            return [_distances_from(src, stops) for src in stops]
+        with ProcessPoolExecutor(max_workers=min(workers, len(stops)), initializer=_init_distance_worker,
+                                 initargs=(adjacency,)) as pool:
+            return list(pool.map(_distances_from, stops, [stops] * len(stops)))
+
+    @staticmethod
+    def _greedy_order(matrix: list, deadline: float) -> list:
+        """
+        * Nearest neighbor orders from as many start stops as the time allows (at least one), returns the cheapest.
+        """
+        n = len(matrix)
+        best, best_cost = None, float('inf')
+        for start in range(n):
+            if best is not None and time.perf_counter() > deadline:
+                break
+            order = [start]
+            left = set(range(n))
+            left.discard(start)
+            cost = 0.0
+            while left:
+                row = matrix[order[-1]]
+                nxt = min(left, key=lambda c: row[c])
+                cost += row[nxt]
+                order.append(nxt)
+                left.discard(nxt)
+            if best is None or cost < best_cost:
+                best, best_cost = order, cost
+        return best
+
+    @staticmethod
+    def _improve_order(matrix: list, order: list, deadline: float) -> list:
+        """
+        * Local search on an open path with asymmetric distances, until no move helps or the deadline passed:
+        * 2-opt - reverse a segment. Reversing changes the segment's inner distances, so prefix sums of the
+        *         forward and backward distances along the order give them in O(1),
+        * Or-opt - move a segment of 1..3 stops to another place in the order (without reversing it).
+        """
+        n = len(order)
+
+        def prefix_sums(o):
+            fwd, bwd = [0.0] * n, [0.0] * n  # fwd[t] = cost of o[0..t], bwd[t] = cost of o[0..t] walked backwards
+            for t in range(1, n):
+                fwd[t] = fwd[t - 1] + matrix[o[t - 1]][o[t]]
+                bwd[t] = bwd[t - 1] + matrix[o[t]][o[t - 1]]
+            return fwd, bwd
+
+        def link(a, b):  # Cost of the edge a->b, 0 if one side is the end of the path
+            return 0 if a is None or b is None else matrix[a][b]
+
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            # 2-opt
+            fwd, bwd = prefix_sums(order)
+            for i in range(0, n - 1):
+                for j in range(i + 1, n):
+                    a = order[i - 1] if i > 0 else None
+                    b = order[j + 1] if j < n - 1 else None
+                    before = link(a, order[i]) + (fwd[j] - fwd[i]) + link(order[j], b)
+                    after = link(a, order[j]) + (bwd[j] - bwd[i]) + link(order[i], b)
+                    if after < before - 1e-9:
+                        order[i:j + 1] = order[i:j + 1][::-1]
+                        fwd, bwd = prefix_sums(order)
+                        improved = True
+                if time.perf_counter() > deadline:
+                    return order
+            # Or-opt
+            for length in (1, 2, 3):
+                i = 0
+                while i <= n - length:
+                    a = order[i - 1] if i > 0 else None
+                    b = order[i + length] if i + length < n else None
+                    first, last = order[i], order[i + length - 1]
+                    gain = link(a, first) + link(last, b) - link(a, b)  # Saved by taking the segment out
+                    rest = order[:i] + order[i + length:]
+                    for p in range(len(rest) + 1):
+                        if p == i:
+                            continue
+                        x = rest[p - 1] if p > 0 else None
+                        y = rest[p] if p < len(rest) else None
+                        if link(x, first) + link(last, y) - link(x, y) < gain - 1e-9:
+                            order = rest[:p] + order[i:i + length] + rest[p:]
+                            improved = True
+                            break
+                    i += 1
+                if time.perf_counter() > deadline:
+                    return order
+        return order
+
+    def _dijkstra_iter(self, src: int, reverse: bool = False, budget: QueryBudget = None):
+        """
+        * Lazy Dijkstra over the graph from src using a binary heap.
+        * Each node is yielded once, when it is settled, so the nodes come out ordered by distance.
+        * State is kept in local dictionaries, so the consumer may stop at any point
+        * and only the explored region of the graph was touched.
+        @param src: The start node id
+        @param reverse: True to run over the in edges, i.e. find the distances from every node to src
+        @param budget: An optional QueryBudget, every settled node spends one expansion, the generator stops once it ran out
+        @return: A generator of (node_id, distance, previous_node_id) triples
+        """
+        edges_of = self._graph.all_in_edges_of_node if reverse else self._graph.all_out_edges_of_node
+        dist = {src: 0.0}
+        settled = set()
+        heap = [(0.0, 0, src, None)]  # (distance, tie breaker, key, previous key)
+        counter = 1
+        while heap:
+            d, _, key, prev = heapq.heappop(heap)
+            if key in settled:
+                continue
+            if budget is not None and not budget.spend():
+                return
+            settled.add(key)
+            yield key, d, prev
+            for dest, edge in edges_of(key).items():
+                if dest in settled:
+                    continue
+                nd = d + edge.weight
+                if nd < dist.get(dest, float('inf')):
+                    dist[dest] = nd
+                    heapq.heappush(heap, (nd, counter, dest, key))
+                    counter += 1
+
     def reset_tags(self):
         for key in self._graph.get_all_v().keys():
             node = self.get_graph().get_node(key)
@@ -183,40 +629,118 @@ class GraphAlgo(GraphAlgoInterface):
             node = self._graph.get_node(key)
             node.weight = float('inf')
 
-    def connected_component(self, id1: int) -> list:
+    def connected_component(self, id1: int, budget: QueryBudget = None) -> list:
         """
         * Finds the Strongly Connected Component(SCC) that node id1 is a part of.
         * Notes: If the graph is None or id1 is not in the graph, the function should return an empty list []
         @param id1: The node id
+        @param budget: An optional QueryBudget, if it runs out the result is only a part of the SCC
+        *              (and budget.incomplete is set)
         @return: The list of nodes in the SCC
         """
         if self._graph is None or self._graph.get_node(id1) is None:
             return []
 
-        self.reset_tags()  # This method executes a BFS and tag nodes so reset_tags() must be called.
+        if self.sparse:  # Both Kosaraju passes as vectorized traversals, no tags and no transposed copy
+            sg = self.get_sparse_graph()
+            both = sg.reachable(id1, budget=budget) & sg.reachable(id1, reverse=True, budget=budget)
+            return [self._graph.get_node(sg.keys[i]) for i in both.nonzero()[0]]
 
-        # Traverse the original graph, from node id1, and tag all reachable nodes
-        ans = []
-        src = id1  # alias
-        original_graph = self.get_graph()
-        self.traverse_breadth_first(src, original_graph)
-        # Transpose/Reverse graph's edges
-        transposed_graph = self.reverse_graph()
-        # Traverse the transposed graph, from node id1, and un-tag all reachable nodes
-        self.traverse_breadth_first(src, transposed_graph)
-
-        # Iterate over nodes in the transposed graph and find the nodes that are tagged twice!
-        for key in transposed_graph.get_all_v():
-            node = transposed_graph.get_node(key)
-            if node.tag == 2:
-                ans.append(self._graph.get_node(node.key))  # Append original node
-        return ans
+        # Kosaraju's two passes: the nodes reachable from id1, and the nodes that can reach id1 (over the in edges).
+        # Both BFS's keep their state in local dictionaries, so the graph is never written.
+        forward = self.bfs_levels(id1, budget=budget)
+        backward = self.bfs_levels(id1, reverse=True, budget=budget)
+        return [node for key, node in self._graph.get_all_v().items() if key in forward and key in backward]
+
+    def is_reachable(self, id1: int, id2: int) -> bool:
+        """
+        * Checks if there is a directed path from node id1 to node id2.
+        * The query is answered by a reachability index over the SCC condensation of the graph,
+        * which is built on the first query and rebuilt only after the graph has changed (by mc).
+        @param id1: The start node id
+        @param id2: The end node id
+        @return: True if id2 is reachable from id1, False o.w.
+        """
+        return self.get_reachability_index().is_reachable(id1, id2)
+
+    def get_reachability_index(self) -> ReachabilityIndex:
+        """
+        @return: The reachability index of the graph, its stats() reports the build time and memory.
+        """
+        with self._cache_lock:
+            if self._reachability is None:
+                self._reachability = ReachabilityIndex(self._graph)
+            if self._reachability.is_stale():
+                self._reachability.build(self.condensation())
+            return self._reachability
+
+    def condensation(self) -> Condensation:
+        """
+        * Returns the condensation of the graph - the DAG of its Strongly Connected Components(SCC),
+        * with a node-to-component mapping, inter-component edges, a topological ordering, sources and sinks.
+        * The SCCs are found by Tarjan's algorithm in O(|V|+|E|), and the result is cached until the graph changes (by mc).
+        @return: The condensation of the graph
+        """
+        with self._cache_lock:
+            if self._condensation is None or self._condensation.mc != self._graph.get_mc():
+                self._condensation = Condensation(self._graph)
+            return self._condensation
+
+    def component_views(self):
+        """
+        * Yields one view of the graph per Strongly Connected Component(SCC), the subgraph induced by its nodes
+        * (see DiGraph.subgraph()), in the topological order of the condensation. The views copy nothing,
+        * so every component can be handed to its own GraphAlgo (or thread) for separate processing.
+        @return: A generator of SubGraph views
+        """
+        for component in self.condensation().components:
+            yield SubGraph(self._graph, frozenset(component))
+
+    def bfs_levels(self, src: int, reverse: bool = False, budget: QueryBudget = None) -> dict:
+        """
+        * Finds the BFS level (number of edges on the shortest unweighted path) of every node reachable from src.
+        * The keys of the returned dictionary are exactly the nodes reachable from src.
+        @param src: The start node id
+        @param reverse: True to traverse the in edges, i.e. find the nodes that can reach src
+        @param budget: An optional QueryBudget, every visited node spends one expansion,
+        *              if it runs out only the nodes found so far are returned (and budget.incomplete is set)
+        @return: A dictionary of {node_id: level}, empty if src is not in the graph
+        """
+        if self._graph.get_node(src) is None:
+            return {}
+        if self.sparse:
+            sg = self.get_sparse_graph()
+            levels = sg.bfs_levels(src, reverse, budget)
+            return {sg.keys[i]: int(levels[i]) for i in (levels >= 0).nonzero()[0]}
+        levels = {src: 0}
+        q = deque([src])
+        while q:
+            curr = q.popleft()
+            if budget is not None and not budget.spend():
+                break
+            edges = self._graph.all_in_edges_of_node(curr) if reverse else self._graph.all_out_edges_of_node(curr)
+            for neighbor in edges:
+                if neighbor not in levels:
+                    levels[neighbor] = levels[curr] + 1
+                    q.append(neighbor)
+        return levels
+
+    def get_sparse_graph(self):
+        """
+        * Returns the sparse matrix form of the graph that the vectorized traversals run on.
+        * It is built on first use and rebuilt only when the graph has changed (by mc).
+        """
+        from SparseTraversal import SparseGraph  # numpy & scipy are only needed by the sparse backend
+        with self._cache_lock:
+            if self._sparse_graph is None or self._sparse_graph.mc != self._graph.get_mc():
+                self._sparse_graph = SparseGraph(self._graph)
+            return self._sparse_graph
 
     def traverse_breadth_first(self, src: int = 0, graph: GraphInterface = None):
         """
         * This method is made to traverse any node in the graph and set tag on them using bfs algorithm.
         """
-        if not isinstance(graph, DiGraph) or graph is None or self._graph.get_node(src) is None:
+        if not isinstance(graph, GraphInterface) or graph is None or self._graph.get_node(src) is None:
             return
         curr = graph.get_node(src)
 
@@ -260,24 +784,38 @@ class GraphAlgo(GraphAlgoInterface):
 
         return ans
 
-    def connected_components(self) -> List[list]:
+    def connected_components(self, budget: QueryBudget = None) -> List[list]:
         """
         * This method finds all the Strongly Connected Components(SCC) in the graph.
         * Notes: If the graph is None the function should return an empty list []
+        @param budget: An optional QueryBudget, if it runs out only the SCCs completed so far are returned
+        *              (and budget.incomplete is set)
         @return: The list all SCC
         """
-        self.reset_tags()
         ans = []
         visited = dict()  # A dictionary of visited nodes
 
         for key in self._graph.get_all_v():
             if not visited.get(key):
-                path = self.connected_component(key)
+                path = self.connected_component(key, budget)
+                if budget is not None and budget.incomplete:
+                    break
                 for node in path:
                     visited.__setitem__(node.key, True)
                 ans.append(path)
         return ans
 
+    def connected_components_parallel(self, workers: int = None) -> List[list]:
+        """
+        * Finds all the Strongly Connected Components(SCC) in the graph on a pool of processes,
+        * by forward-backward pivot splitting with trimming over a shared memory array form of the graph (see ParallelSCC).
+        * Gives the same partition as connected_components(), the order of the SCCs may differ.
+        @param workers: The number of processes (os.cpu_count() if None)
+        @return: The list all SCC
+        """
+        from ParallelSCC import parallel_scc  # numpy is only needed by the parallel engine
+        return [[self._graph.get_node(key) for key in scc] for scc in parallel_scc(self._graph, workers)]
+
     def plot_graph(self):
         """
         Plots the graph.
@@ -288,23 +826,30 @@ class GraphAlgo(GraphAlgoInterface):
         plt.title("Our graph:" + g.__str__())
         plt.xlabel("X")
         plt.ylabel("-<")  # I should flip 'Y' letter so I decided to write it by a tricky way. :)
+        set_location = getattr(g, "set_node_location", None)  # Read only graphs (snapshots, subgraphs) have none
+        points = {}  # {key: (x, y)}
+
+        def point(key):
+            if key not in points:
+                location = g.get_all_v()[key].location
+                if location is None:
+                    pos = self.get_random_location()  # get a elegant location
+                    if set_location is not None and set_location(key, pos):
+                        location = g.get_all_v()[key].location
+                    else:  # The position is only used for this plot
+                        points[key] = pos[0], pos[1]
+                        return points[key]
+                points[key] = location.x, location.y
+            return points[key]
+
         for src, node in g.get_all_v().items():
             # Print the node point
-            if node.location is None:
-                pos = self.get_random_location()  # get a elegant location
-                node.location = GeoLocation(pos)
-            plt.plot(node.location.x, node.location.y, marker='o', markerfacecolor='red', markersize=3, color='yellow')
-            plt.text(node.location.x, node.location.y, str(node.key))
+            x1, y1 = point(src)
+            plt.plot(x1, y1, marker='o', markerfacecolor='red', markersize=3, color='yellow')
+            plt.text(x1, y1, str(node.key))
             # Print the edge line
             for dest in g.all_out_edges_of_node(src).keys():
-                x1 = g.get_all_v()[src].location.x
-                y1 = g.get_all_v()[src].location.y
-                if g.get_all_v()[dest].location is None:
-                    pos = self.get_random_location()
-                    g.get_all_v()[dest].location = GeoLocation(pos)
-                    g.get_all_v()[dest].location = GeoLocation(pos)
-                x2 = g.get_all_v()[dest].location.x
-                y2 = g.get_all_v()[dest].location.y
+                x2, y2 = point(dest)
                 plt.arrow(x1, y1, x2 - x1, y2 - y1, width=0.00001, linewidth=0.05)
         plt.show()
 
@@ -324,49 +869,27 @@ class GraphAlgo(GraphAlgoInterface):
             z = 0
             ans = x, y, z
             return ans
-        counter = 0
-        for src, node in self._graph.get_all_v().items():
-            if node.location is not None:
-                counter += 1
-        x = random.uniform(max_x, min_x)
+        x = random.uniform(max_x, min_x)  # There is a bounding box, so more than 4 nodes have a location
         y = random.uniform(max_y, min_y)
         z = random.uniform(max_z, min_z)
-        if counter == 0:  # means all nodes doesn't have any location
-            x = random.uniform(32, 33)
-            y = random.uniform(35, 36)
-            z = 0
-            ans = x, y, z
-        else:
-            ans = x, y, z
+        ans = x, y, z
         return ans
 
     def get_max_and_min(self):
         """
         This method get the max and min of the bounding box on current graph.
+        The bounding box is maintained by the spatial index of a DiGraph, so no scan over the nodes is needed,
+        other graphs (snapshots, subgraphs) are scanned.
         @return max and min of bounding box , o.w -inf&inf
         """
-        max_x = float('-inf')
-        min_x = float('inf')
-        max_y = float('-inf')
-        min_y = float('inf')
-        max_z = float('-inf')
-        min_z = float('inf')
-        ans = max_x, max_y, max_z, min_x, min_y, min_z
-        counter = 0
-        for src, node in self._graph.get_all_v().items():
-            if node.location is not None:
-                x = node.location.x
-                y = node.location.y
-                z = node.location.z
-                counter += 1
-                max_x = x if x > max_x else max_x
-                min_x = x if x < min_x else min_x
-                max_y = y if y > max_y else max_y
-                min_y = y if y < min_y else min_y
-                max_z = z if z > max_z else max_z
-                min_z = z if z < min_z else min_z
-        if counter > 4:
-            ans = max_x, max_y, max_z, min_x, min_y, min_z
+        ans = float('-inf'), float('-inf'), float('-inf'), float('inf'), float('inf'), float('inf')
+        index = getattr(self._graph, "spatial_index", None)
+        if index is not None:
+            return index.bounding_box() if len(index) > 4 else ans
+        points = [node.location for node in self._graph.get_all_v().values() if node.location is not None]
+        if len(points) > 4:
+            ans = max(p.x for p in points), max(p.y for p in points), max(p.z for p in points), \
+                  min(p.x for p in points), min(p.y for p in points), min(p.z for p in points)
         return ans
 
     def __repr__(self):
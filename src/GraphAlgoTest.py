@@ -1,9 +1,10 @@
 import unittest
+from importlib.util import find_spec
 
 import random as r
 
-from src.DiGraph import DiGraph
-from src.GraphAlgo import GraphAlgo
+from DiGraph import DiGraph
+from GraphAlgo import GraphAlgo
 
 
 # This test class behaves as if any graph was given -
@@ -115,6 +116,735 @@ class GraphAlgoTest(unittest.TestCase):
 
         assert not g1 == g2
 
+    def test_edge_list_mtx(self):
+        import GraphFormats
+        import os
+        import tempfile
+
+        algo = GraphAlgo()
+        assert algo.load_from_json('../data/Graphs_no_pos/G_100_800_0.json')
+        graph = algo.get_graph()
+        graph.add_node(500)  # A node without edges
+        with tempfile.TemporaryDirectory() as folder:
+            loaded = GraphAlgo()
+            assert algo.save_to_edge_list(os.path.join(folder, "g.txt"))
+            assert loaded.load_from_edge_list(os.path.join(folder, "g.txt"))
+            assert loaded.get_graph() == graph
+            assert loaded.shortest_path(0, 5).keys() == algo.shortest_path(0, 5).keys()
+
+            assert algo.save_to_mtx(os.path.join(folder, "g.mtx"))
+            assert loaded.load_from_mtx(os.path.join(folder, "g.mtx"))
+            g = loaded.get_graph()
+            assert g.v_size == 501 and g.e_size == graph.e_size  # The ids 100..499 come back without edges
+            for key in graph.get_all_v():
+                assert g.all_out_edges_of_node(key) == graph.all_out_edges_of_node(key)
+            assert g.degree_histogram("in")[0] == graph.degree_histogram("in")[0] + 400
+
+            # Comments, blank lines, missing weights and small chunks
+            path = os.path.join(folder, "small.txt")
+            with open(path, "w") as f:
+                f.write("# a comment\n0 1\n1 2 2.5\n\n7\n2 0 1\n2 2 1\n0 1 3\n")
+            g = GraphFormats.read_edge_list(path, chunk_size=4)
+            assert sorted(g.get_all_v()) == [0, 1, 2, 7] and g.e_size == 3
+            assert g.all_out_edges_of_node(0)[1].weight == 1 and g.all_out_edges_of_node(1)[2].weight == 2.5
+
+            with open(path, "w") as f:  # Lines of 2 and 4 tokens, as many tokens as 3 lines of 3
+                f.write("0 1 2.5\n1 2\n2 3 1 9\n")
+            g = GraphFormats.read_edge_list(path)
+            assert g.e_size == 3 and g.all_out_edges_of_node(1)[2].weight == 1
+            assert g.all_out_edges_of_node(2)[3].weight == 1 and 9 not in g.get_all_v()
+
+            path = os.path.join(folder, "small.mtx")
+            with open(path, "w") as f:
+                f.write("%%MatrixMarket matrix coordinate pattern symmetric\n% a comment\n4 4 3\n2 1\n3 2\n3 3\n")
+            g = GraphFormats.read_mtx(path)
+            assert sorted(g.get_all_v()) == [0, 1, 2, 3] and g.e_size == 4
+            assert sorted(g.all_out_edges_of_node(1)) == [0, 2] and g.all_in_edges_of_node(1)[2].weight == 1
+            with open(path, "w") as f:
+                f.write("%%MatrixMarket matrix array real general\n2 2\n1\n2\n3\n4\n")
+            self.assertRaises(ValueError, GraphFormats.read_mtx, path)
+            assert not GraphAlgo().load_from_mtx(path)
+
+    def test_journal(self):
+        from GraphJournal import GraphJournal
+        import os
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as folder:
+            journal_file = os.path.join(folder, "graph.ndjson")
+            base_file = os.path.join(folder, "graph.json")
+            graph = self.example_graph()
+            journal = GraphJournal(journal_file, base_file, compact_every=0)
+            journal.attach(graph)
+            base_size = os.path.getsize(base_file)
+
+            graph.remove_edge(1, 4)
+            graph.add_node(7, (1.5, 2, 0))
+            graph.add_edge(7, 1, 2.5)
+            graph.remove_node(0)
+            graph.add_edge(3, 2, 1)
+            graph.set_node_location(3, (1, 1, 0))
+            graph.set_node_location(7, None)
+            journal.close()
+            assert os.path.getsize(base_file) == base_size  # Only the journal was written
+            with open(journal_file) as f:
+                assert len(f.readlines()) == 8
+
+            recovered = GraphJournal(journal_file, base_file).recover()
+            assert recovered == graph and recovered.get_mc() == graph.get_mc()
+            recovered.journal.close()
+
+            # Compaction rewrites the base and restarts the journal
+            journal = GraphJournal(journal_file, base_file, compact_every=3)
+            graph = journal.recover()
+            for i in range(10):
+                graph.add_node(100 + i)
+            graph.add_edge(100, 101, 4)
+            journal.close()
+            with open(journal_file) as f:
+                assert len(f.readlines()) == 2  # base + the last change
+            recovered = GraphJournal(journal_file, base_file).recover()
+            assert recovered == graph and recovered.get_mc() == graph.get_mc()
+            recovered.journal.close()
+
+            # A node removed right at a compaction boundary
+            journal = GraphJournal(journal_file, base_file, compact_every=2)
+            graph = self.example_graph()
+            journal.attach(graph)
+            graph.add_edge(1, 3, 1)
+            assert graph.remove_node(0) and graph.get_node(0) is None
+            journal.close()
+            recovered = GraphJournal(journal_file, base_file).recover()
+            assert recovered == graph
+            recovered.journal.close()
+
+            # A torn last line is cut off, so what is appended after it is recovered too
+            journal = GraphJournal(journal_file, base_file, compact_every=0)
+            graph = self.example_graph()
+            journal.attach(graph)
+            graph.add_edge(1, 3, 1)
+            journal.close()
+            with open(journal_file, "a") as f:
+                f.write('{"op":"add_edge","mc":')
+            graph = journal.recover()
+            assert graph.e_size == 10
+            graph.add_edge(3, 1, 1)
+            graph.add_edge(6, 1, 1)
+            journal.close()
+            recovered = GraphJournal(journal_file, base_file).recover()
+            assert recovered == graph and recovered.e_size == 12
+            recovered.journal.close()
+
+            # A base that can not be loaded is not replayed over, nor compacted over
+            with open(base_file) as f:
+                good_base = f.read()
+            with open(base_file, "w") as f:
+                f.write(good_base[:len(good_base) // 2])
+            broken = GraphJournal(journal_file, base_file, compact_every=1)
+            self.assertRaises(ValueError, broken.recover)
+            assert broken._file is None
+            with open(base_file) as f:
+                assert f.read() == good_base[:len(good_base) // 2]
+            with open(base_file, "w") as f:
+                f.write(good_base)
+
+            # A base that can not be written leaves the old base and the journal as they were
+            with open(base_file) as f:
+                base = f.read()
+            journal = GraphJournal(journal_file, base_file, compact_every=2)
+            graph = journal.recover()
+            os.makedirs(base_file + ".tmp")
+            graph.add_node(200)
+            graph.add_node(201)
+            graph.add_edge(200, 201, 1)
+            assert not journal.compact()
+            journal.close()
+            with open(base_file) as f:
+                assert f.read() == base
+            recovered = GraphJournal(journal_file, base_file).recover()
+            assert recovered == graph
+            recovered.journal.close()
+
+    def test_k_shortest_paths(self):
+        g = DiGraph()
+        for i in range(6):
+            g.add_node(i)
+        for src, dest, w in [(0, 1, 3), (0, 2, 2), (1, 3, 4), (2, 1, 1), (2, 3, 2), (2, 4, 3), (3, 4, 2), (3, 5, 1),
+                             (4, 5, 2)]:
+            g.add_edge(src, dest, w)
+        algo = GraphAlgo(g)
+        paths = list(algo.k_shortest_paths(0, 5, 3))
+        assert paths[:2] == [(5, [0, 2, 3, 5]), (7, [0, 2, 4, 5])]
+        assert paths[2][0] == 8 and paths[2][1] in [[0, 1, 3, 5], [0, 2, 1, 3, 5], [0, 2, 3, 4, 5]]
+        assert list(algo.k_shortest_paths(5, 0, 3)) == []
+        assert len(list(algo.k_shortest_paths(0, 5, 100))) == 7  # All the loopless paths
+
+        graph = self.make_graph(9, 30)
+        algo = GraphAlgo(graph)
+        for src in range(3):
+            for dest in range(3, 6):
+                all_costs = sorted(self.simple_path_costs(graph, src, dest))
+                paths = list(algo.k_shortest_paths(src, dest, 10))
+                assert [round(c, 9) for c, p in paths] == [round(c, 9) for c in all_costs[:10]]
+                assert len(set(tuple(p) for c, p in paths)) == len(paths)
+                for cost, path in paths:
+                    assert len(set(path)) == len(path) and path[0] == src and path[-1] == dest
+
+    def simple_path_costs(self, graph: object, src: int, dest: int) -> list:
+        ans = []
+
+        def dfs(key, visited, cost):
+            if key == dest:
+                ans.append(cost)
+                return
+            for neighbor, edge in graph.all_out_edges_of_node(key).items():
+                if neighbor not in visited:
+                    visited.add(neighbor)
+                    dfs(neighbor, visited, cost + edge.weight)
+                    visited.remove(neighbor)
+
+        dfs(src, {src}, 0)
+        return ans
+
+    def test_tsp(self):
+        from itertools import permutations
+        from unittest import mock
+
+        algo = GraphAlgo(self.example_graph())
+        assert algo.tsp([]) == (float('inf'), [])
+        assert algo.tsp([3]) == (0, [3])
+        assert algo.tsp([3, 100]) == (float('inf'), [])
+        assert algo.tsp([6, 1]) == (float('inf'), [])  # 6 and 1 can not reach each other
+        assert algo.tsp([1, 3, 0], workers=1) == (4, [1, 4, 2, 0, 3])
+        with mock.patch("GraphAlgo.os.cpu_count", return_value=4), \
+                mock.patch("GraphAlgo.ProcessPoolExecutor", side_effect=AssertionError("no pool for a few stops")):
+            assert algo.tsp([1, 3, 0]) == (4, [1, 4, 2, 0, 3])
+
+        graph = self.make_graph(25, 100)
+        algo = GraphAlgo(graph)
+        cities = self.get_max_scc(graph)[:6]
+        cities = [node.key for node in cities]
+        if len(cities) < 2:
+            return
+        for workers in [1, 2]:
+            cost, path = algo.tsp(cities, workers=workers)
+            assert set(cities) <= set(path) and path[0] in cities and path[-1] in cities
+            assert abs(cost - sum(graph.all_out_edges_of_node(path[i])[path[i + 1]].weight
+                                  for i in range(len(path) - 1))) < 1e-9
+            best = min(sum(algo.shortest_path(o[i], o[i + 1])[0] for i in range(len(o) - 1))
+                       for o in permutations(cities))
+            assert cost >= best - 1e-9 and cost <= best * 1.5  # Greedy + local search is close to the optimum
+
+    def test_tsp_budget(self):
+        import time
+        from unittest import mock
+
+        graph = DiGraph()
+        n = 200
+        for i in range(n):
+            graph.add_node(i)
+        for i in range(n):
+            graph.add_edge(i, (i + 1) % n, 1)
+            graph.add_edge((i + 1) % n, i, 1)
+            graph.add_edge(i, (i * 7 + 3) % n, 5)
+        algo = GraphAlgo(graph)
+        budget, left = 0.5, []
+        improve = GraphAlgo._improve_order
+
+        def timed_improve(matrix, order, deadline):
+            left.append(deadline - time.perf_counter())
+            return improve(matrix, order, deadline)
+
+        with mock.patch.object(GraphAlgo, "_improve_order", side_effect=timed_improve):
+            cost, path = algo.tsp(list(range(n)), time_budget=budget, workers=1)
+        assert set(path) == set(range(n))
+        # The greedy starts stop at a share of the budget, 2-opt/Or-opt get the rest
+        assert len(left) == 1 and left[0] >= budget * 0.5
+
+    @unittest.skipIf(find_spec("numpy") is None, "The generator needs numpy")
+    def test_generator(self):
+        from GraphGenerator import generate, GeneratedGraph, FAMILIES
+        import os
+        import tempfile
+
+        for family in FAMILIES:
+            g1 = generate(family, 200, 1600, seed=7)
+            g2 = generate(family, 200, 1600, seed=7)
+            assert (g1.src == g2.src).all() and (g1.dest == g2.dest).all() and (g1.w == g2.w).all()
+            assert not (g1.src == g1.dest).any()
+            assert len(set(zip(g1.src.tolist(), g1.dest.tolist()))) == g1.e_size()
+            if family != "grid":
+                assert g1.e_size() == 1600
+                assert not (generate(family, 200, 1600, seed=8).dest == g1.dest).all()
+
+            with tempfile.TemporaryDirectory() as folder:
+                algo = GraphAlgo()
+                g1.write_json(os.path.join(folder, "g.json"), chunk=333)
+                assert algo.load_from_json(os.path.join(folder, "g.json"))
+                graph = algo.get_graph()
+                assert graph.v_size == 200 and graph.e_size == g1.e_size()
+                assert (graph.get_node(0).location is None) == (g1.positions is None)
+                assert graph.all_out_edges_of_node(int(g1.src[0]))[int(g1.dest[0])].weight == g1.w[0]
+
+                g1.write_binary(os.path.join(folder, "g.npz"))
+                g3 = GeneratedGraph.read_binary(os.path.join(folder, "g.npz"))
+                assert g3.n_nodes == 200 and (g3.w == g1.w).all() and (g3.positions is None) == (g1.positions is None)
+
+        self.assertRaises(ValueError, generate, "power_law", 20, 380)  # Complete, the light nodes are rarely drawn
+        assert generate("no_pos", 20, 380).e_size() == 380
+
+    @unittest.skipIf(find_spec("numpy") is None, "The catalog needs numpy")
+    def test_catalog(self):
+        from GraphCatalog import GraphCatalog
+        import os
+        import shutil
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as folder:
+            os.makedirs(os.path.join(folder, "sub"))
+            shutil.copy("../data/Graphs_no_pos/G_10_80_0.json", folder)
+            shutil.copy("../data/Graphs_on_circle/G_100_800_1.json", os.path.join(folder, "sub"))
+            with open(os.path.join(folder, "notes.txt"), "w") as f:
+                f.write("not a graph")
+            catalog = GraphCatalog(folder)
+            names = sorted(catalog.names())
+            assert names == sorted(["G_10_80_0.json", os.path.join("sub", "G_100_800_1.json"), "notes.txt"])
+
+            graphs = sorted(name for name in names if name.endswith(".json"))
+            loaded = catalog.load(workers=2)
+            assert sorted(loaded.keys()) == graphs and catalog.cache_hits == 0
+            for name, algo in loaded.items():
+                expected = GraphAlgo()
+                assert expected.load_from_json(os.path.join(folder, name))
+                assert algo.get_graph() == expected.get_graph()
+
+            # Unchanged files come from the parse cache
+            again = catalog.load(graphs, workers=1)
+            assert catalog.cache_hits == 2
+            assert again["G_10_80_0.json"].get_graph() == loaded["G_10_80_0.json"].get_graph()
+
+            # A changed file is parsed again
+            algo = loaded["G_10_80_0.json"]
+            algo.get_graph().remove_node(0)
+            algo.save_to_json(os.path.join(folder, "G_10_80_0.json"))
+            catalog.refresh()
+            assert catalog.get("G_10_80_0.json").get_graph().v_size == 9 and catalog.cache_hits == 2
+
+    @unittest.skipIf(find_spec("numpy") is None, "The parallel SCC engine needs numpy")
+    def test_connected_components_parallel(self):
+        import ParallelSCC
+
+        small = ParallelSCC.SMALL_TASK
+        ParallelSCC.SMALL_TASK = 4  # Run the forward-backward steps even on small graphs
+        try:
+            for graph in [self.example_graph(), self.make_graph(60, 90), self.make_graph(100, 400)]:
+                algo = GraphAlgo(graph)
+                expected = sorted(sorted(node.key for node in scc) for scc in algo.connected_components())
+                actual = sorted(sorted(node.key for node in scc) for scc in algo.connected_components_parallel(1))
+                assert actual == expected
+        finally:
+            ParallelSCC.SMALL_TASK = small
+        algo = GraphAlgo(self.make_graph(100, 200))
+        expected = sorted(sorted(node.key for node in scc) for scc in algo.connected_components())
+        actual = sorted(sorted(node.key for node in scc) for scc in algo.connected_components_parallel(2))
+        assert actual == expected
+        assert GraphAlgo().connected_components_parallel() == []
+
+    def test_query_budget(self):
+        from QueryBudget import QueryBudget, CancellationToken
+
+        graph = self.make_graph(200, 600)
+        algo = GraphAlgo(graph)
+        src = max(graph.get_all_v(), key=lambda key: len(algo.bfs_levels(key)))  # Reaches (almost) every node
+        far = max(algo.bfs_levels(src).items(), key=lambda item: item[1])[0]
+
+        budget = QueryBudget(max_expansions=1000000, timeout=60)
+        dist, path = algo.shortest_path(src, far, budget)
+        assert (dist, [n.key for n in path]) == (lambda d, p: (d, [n.key for n in p]))(*algo.shortest_path(src, far))
+        assert not budget.incomplete
+        budget = QueryBudget(max_expansions=3)
+        assert algo.shortest_path(src, far, budget) == (float('inf'), []) and budget.incomplete
+        budget = QueryBudget(max_expansions=4)
+        assert len(list(algo.k_nearest(src, 10, budget))) == 3 and budget.incomplete
+        budget = QueryBudget(max_expansions=6)
+        assert len(list(algo.k_shortest_paths(src, far, 3, budget))) == 0 and budget.incomplete
+        chain = DiGraph()
+        for i in range(6):
+            chain.add_node(i)
+        for i in range(5):
+            chain.add_edge(i, i + 1, 1)
+        budget = QueryBudget(max_expansions=6)  # Runs out in the first spur search, after the reverse tree
+        assert list(GraphAlgo(chain).k_shortest_paths(0, 5, 2, budget)) == [] and budget.incomplete
+        assert [p for c, p in GraphAlgo(chain).k_shortest_paths(0, 5, 2)] == [list(range(6))]
+
+        budget = QueryBudget(max_expansions=5)
+        dist, nearest, prev = algo.multi_source_shortest_paths([src], budget=budget)
+        assert budget.incomplete and sum(1 for n in nearest.values() if n is not None) == 5
+        assert sum(1 for d in dist.values() if d != float('inf')) == 5
+
+        full = sorted(sorted(node.key for node in scc) for scc in algo.connected_components())
+        for sparse in [False, True]:
+            budget = QueryBudget()
+            GraphAlgo(graph, sparse=sparse).connected_components(budget)
+            budget = QueryBudget(max_expansions=budget.expansions // 2)
+            partial = GraphAlgo(graph, sparse=sparse).connected_components(budget)
+            assert budget.incomplete and 0 < len(partial) < len(full)
+            assert all(sorted(node.key for node in scc) in full for scc in partial)  # Only complete SCCs
+
+        token = CancellationToken()
+        budget = QueryBudget(token=token)
+        assert algo.bfs_levels(0, budget=budget) == algo.bfs_levels(0) and not budget.incomplete
+        token.cancel()
+        assert algo.bfs_levels(0, budget=budget) == {0: 0} and budget.incomplete
+        budget = QueryBudget(timeout=0)
+        assert [node.key for node in algo.connected_component(0, budget)] == [0] and budget.incomplete
+
+    def test_path_result(self):
+        algo = GraphAlgo(self.example_graph())
+        result = algo.shortest_path(5, 2)
+        dist, path = result
+        assert dist == 3 and result.keys() == [5, 1, 4, 2] and list(result.distances) == [0, 1, 2, 3]
+        assert result.ids.typecode == 'q' and result.hops() == 3
+        assert path._nodes is None  # No node was created yet
+        assert [node.key for node in path] == [5, 1, 4, 2] and path[-1].weight == dist and path[-1] is path[-1]
+        assert path[0] is not algo.get_graph().get_node(5) and algo.get_graph().get_node(5).weight == 0
+        assert [node.key for node in path[1:3]] == [1, 4]
+        assert algo.shortest_path(2, 6) == (float('inf'), []) and algo.shortest_path(1, 1) == (0, [])
+
+    def test_path_result_equality(self):
+        algo = GraphAlgo(self.example_graph())
+        graph = algo.get_graph()
+        first, second = algo.shortest_path(5, 2), algo.shortest_path(5, 2)
+        assert first == second and hash(first) == hash(second) and len({first, second}) == 1
+        assert graph.get_node(4) in first.nodes and graph.get_node(3) not in first.nodes
+        assert first.nodes == [graph.get_node(k) for k in [5, 1, 4, 2]]
+        result = algo.shortest_path(5, 2)
+        graph.remove_node(4)  # The path was built before the node was removed
+        assert [node.key for node in result.nodes] == [5, 1, 4, 2] and result.nodes[2].weight == 2
+
+    def test_within_distance(self):
+        algo = GraphAlgo(self.example_graph())
+
+        assert list(algo.within_distance(1, 0.5)) == []
+        assert list(algo.within_distance(1, 1)) == [(4, 1)]
+        near = list(algo.within_distance(1, 3))
+        assert near[0] == (4, 1) and near[3] == (0, 3)
+        assert sorted(near[1:3]) == [(2, 2), (5, 2)]
+        assert list(algo.within_distance(6, 100)) == [(0, 1), (2, 2), (3, 2)]
+        assert list(algo.within_distance(-1, 100)) == []
+
+        graph = self.make_graph(30, 120)
+        algo = GraphAlgo(graph)
+        dists = [dist for key, dist in algo.within_distance(0, 15)]
+        assert dists == sorted(dists)
+        assert all(dist <= 15 for dist in dists)
+
+    def test_multi_source_shortest_paths(self):
+        graph = self.make_graph(40, 120)
+        algo = GraphAlgo(graph)
+        depots = [3, 17, 29, 1000]
+        for reverse in [False, True]:
+            dist, nearest, prev = algo.multi_source_shortest_paths(depots, reverse)
+            assert len(dist) == graph.v_size and nearest[17] == 17 and dist[17] == 0 and prev[17] is None
+            for key in graph.get_all_v():
+                costs = [algo.shortest_path(key, d)[0] if reverse else algo.shortest_path(d, key)[0]
+                         for d in depots[:3]]
+                costs = [0 if key == d else c for c, d in zip(costs, depots)]
+                assert dist[key] == min(costs) or abs(dist[key] - min(costs)) < 1e-9
+                if nearest[key] is None:
+                    assert dist[key] == float('inf') and prev[key] is None
+                    continue
+                assert abs(costs[depots.index(nearest[key])] - dist[key]) < 1e-9
+                if prev[key] is not None:  # The previous node is one edge closer to the same source
+                    src, dest = (key, prev[key]) if reverse else (prev[key], key)
+                    edge = graph.all_out_edges_of_node(src)[dest]
+                    assert nearest[prev[key]] == nearest[key] and abs(dist[prev[key]] + edge.weight - dist[key]) < 1e-9
+        assert algo.multi_source_shortest_paths([])[1] == dict.fromkeys(graph.get_all_v())
+
+    def test_k_nearest(self):
+        algo = GraphAlgo(self.example_graph())
+
+        assert list(algo.k_nearest(1, 0)) == []
+        assert list(algo.k_nearest(1, 1)) == [(4, 1)]
+        assert len(list(algo.k_nearest(1, 100))) == 5
+        assert list(algo.k_nearest(6, 1)) == [(0, 1)]
+
+        graph = self.make_graph(30, 120)
+        algo = GraphAlgo(graph)
+        for key in graph.get_all_v():
+            all_reachable = list(algo.k_nearest(key, graph.v_size))
+            assert list(algo.k_nearest(key, 5)) == all_reachable[:5]
+            if len(all_reachable) > 0:
+                radius = all_reachable[-1][1]
+                assert list(algo.within_distance(key, radius)) == all_reachable
+
+    @unittest.skipIf(find_spec("scipy") is None, "The sparse backend needs numpy & scipy")
+    def test_sparse_traversal(self):
+        for graph in [self.example_graph(), self.make_graph(30, 60), self.make_graph(100, 150)]:
+            algo = GraphAlgo(graph)
+            sparse_algo = GraphAlgo(graph, sparse=True)
+
+            for key in graph.get_all_v():
+                assert algo.bfs_levels(key) == sparse_algo.bfs_levels(key)
+                assert algo.bfs_levels(key, reverse=True) == sparse_algo.bfs_levels(key, reverse=True)
+
+            expected = [sorted(node.key for node in scc) for scc in algo.connected_components()]
+            actual = [sorted(node.key for node in scc) for scc in sparse_algo.connected_components()]
+            assert sorted(expected) == sorted(actual)
+
+        # The sparse form is rebuilt once the graph changes
+        graph = self.example_graph()
+        sparse_algo = GraphAlgo(graph, sparse=True)
+        assert len(sparse_algo.connected_component(1)) == 3
+        graph.remove_edge(5, 1)
+        assert len(sparse_algo.connected_component(1)) == 1
+
+        # ... while weight updates patch it in place
+        sg = sparse_algo.get_sparse_graph()
+        condensation = sparse_algo.condensation()
+        graph.update_edge_weights([(1, 4, 7), (4, 2, 0.5)])
+        assert sparse_algo.get_sparse_graph() is sg and sparse_algo.condensation() is condensation
+        assert sg.out_csr[sg.index[1], sg.index[4]] == 7 and sg.in_csr[sg.index[2], sg.index[4]] == 0.5
+        assert sparse_algo.is_reachable(1, 0) and not sparse_algo.get_reachability_index().is_stale()
+        comp_of = condensation.comp_of
+        assert condensation.to_graph().all_out_edges_of_node(comp_of[4])[comp_of[2]].weight == 0.5
+        graph.update_edge_weight(4, 2, 3)
+        assert condensation.to_graph().all_out_edges_of_node(comp_of[4])[comp_of[2]].weight == 3
+
+    @unittest.skipIf(find_spec("scipy") is None, "The analytics need numpy & scipy")
+    def test_analytics(self):
+        import numpy as np
+        from GraphAnalytics import pagerank, betweenness, closeness
+
+        graph = self.make_graph(12, 40)
+        for key in graph.get_all_v():  # Integer weights, so equal paths tie exactly
+            graph.update_edge_weights([(key, dest, float(r.randint(1, 3))) for dest in graph.all_out_edges_of_node(key)])
+        algo = GraphAlgo(graph)
+        keys = list(graph.get_all_v().keys())
+        n = len(keys)
+
+        pr = pagerank(algo)
+        matrix = np.zeros((n, n))  # The dense Google matrix, column = from
+        for j, key in enumerate(keys):
+            out = graph.all_out_edges_of_node(key)
+            for dest in out:
+                matrix[keys.index(dest), j] += 0.85 / len(out)
+            matrix[:, j] += (0.85 / n if len(out) == 0 else 0) + 0.15 / n
+        values, vectors = np.linalg.eig(matrix)
+        expected = np.real(vectors[:, np.argmax(np.real(values))])
+        expected /= expected.sum()
+        assert pr.stats["converged"] and abs(pr.values.sum() - 1) < 1e-9
+        assert all(abs(pr[key] - expected[i]) < 1e-8 for i, key in enumerate(keys))
+
+        # Betweenness by counting all the shortest paths of every pair
+        expected = dict.fromkeys(keys, 0.0)
+        for s in keys:
+            for t in keys:
+                if s == t:
+                    continue
+                paths = []
+
+                def dfs(key, path, cost):
+                    if key == t:
+                        paths.append((cost, path))
+                        return
+                    for dest, edge in graph.all_out_edges_of_node(key).items():
+                        if dest not in path:
+                            dfs(dest, path + [dest], cost + edge.weight)
+                dfs(s, [s], 0)
+                if paths:
+                    best = [p for c, p in paths if c == min(c for c, p in paths)]
+                    for p in best:
+                        for v in p[1:-1]:
+                            expected[v] += 1 / len(best)
+        bc = betweenness(algo, workers=1, normalized=False)
+        assert all(abs(bc[key] - expected[key]) < 1e-9 for key in keys) and bc.stats["sources"] == n
+        bc2 = betweenness(algo, workers=2, normalized=False)
+        assert np.allclose(bc.values, bc2.values)
+        sampled = betweenness(algo, samples=4, workers=1)
+        assert sampled.stats["sources"] == 4 and (sampled.values >= 0).all()
+
+        cl = closeness(algo)
+        for key in keys:
+            dists = [algo.shortest_path(key, other)[0] for other in keys if other != key]
+            dists = [d for d in dists if d != float('inf')]
+            value = (len(dists) / (n - 1)) * (len(dists) / sum(dists)) if dists else 0
+            assert abs(cl[key] - value) < 1e-9
+        assert closeness(algo, [keys[0], -1]).to_dict().keys() == {keys[0]}
+
+    def test_is_reachable(self):
+        graph = self.example_graph()
+        algo = GraphAlgo(graph)
+        assert algo.is_reachable(1, 3) and algo.is_reachable(6, 3) and algo.is_reachable(4, 4)
+        assert not algo.is_reachable(3, 1) and not algo.is_reachable(0, 6) and not algo.is_reachable(0, -1)
+        graph.remove_edge(4, 2)
+        assert not algo.is_reachable(1, 3)  # The index is rebuilt after the graph changed
+        assert algo.get_reachability_index().stats()["mc"] == graph.get_mc()
+
+        from ReachabilityIndex import ReachabilityIndex
+        for graph in [self.make_graph(40, 50), self.make_graph(60, 70)]:
+            algo = GraphAlgo(graph)
+            labels = ReachabilityIndex(graph, max_bitset_components=0)  # Force the interval labels mode
+            assert labels.stats()["mode"] == "interval"
+            assert algo.get_reachability_index().stats()["mode"] == "bitset"
+            for u in graph.get_all_v():
+                reachable = algo.bfs_levels(u)
+                for v in graph.get_all_v():
+                    assert algo.is_reachable(u, v) == (v in reachable)
+                    assert labels.is_reachable(u, v) == (v in reachable)
+
+    def test_subgraph(self):
+        graph = self.make_graph(30, 120)
+        members = set(r.sample(range(30), 18))
+        view = graph.subgraph(members)
+        copied = DiGraph()  # The same subgraph, copied
+        for key in members:
+            copied.add_node(key)
+        for key in members:
+            for dest, edge in graph.all_out_edges_of_node(key).items():
+                if dest in members:
+                    copied.add_edge(key, dest, edge.weight)
+        assert view.v_size == copied.v_size and view.e_size == copied.e_size
+        assert view.get_node(next(k for k in range(30) if k not in members)) is None
+
+        view_algo, copied_algo = GraphAlgo(view), GraphAlgo(copied)
+        for src in list(members)[:5]:
+            for dest in members:
+                assert view_algo.shortest_path(src, dest)[0] == copied_algo.shortest_path(src, dest)[0]
+        expected = sorted(sorted(node.key for node in scc) for scc in copied_algo.connected_components())
+        assert sorted(sorted(node.key for node in scc) for scc in view_algo.connected_components()) == expected
+
+        # A live view: changes of the graph show in it
+        src = next(k for k in members if len(view.all_out_edges_of_node(k)) > 0)
+        dest = next(iter(view.all_out_edges_of_node(src)))
+        graph.remove_edge(src, dest)
+        assert dest not in view.all_out_edges_of_node(src) and view.e_size == copied.e_size - 1
+
+        algo = GraphAlgo(graph)
+        views = list(algo.component_views())
+        assert sum(v.v_size for v in views) == graph.v_size
+        for v in views:
+            assert len(GraphAlgo(v).connected_components()) == 1
+            assert sorted(v.get_all_v()) == sorted(node.key for node in algo.connected_component(next(iter(v.get_all_v()))))
+
+    def test_plot_views(self):
+        import matplotlib
+        import matplotlib.pyplot as plt
+        import warnings
+        from ConcurrentGraph import ConcurrentGraph
+
+        matplotlib.use("Agg")
+        algo = GraphAlgo()
+        assert algo.load_from_json('../data/Graphs_on_circle/G_10_80_1.json')
+        graph = algo.get_graph()
+        box = algo.get_max_and_min()
+        assert GraphAlgo(graph.snapshot()).get_max_and_min() == box
+        assert GraphAlgo(graph.subgraph(graph.get_all_v())).get_max_and_min() == box
+        assert GraphAlgo(graph.subgraph([0, 1])).get_max_and_min()[0] == float('-inf')  # Too few located nodes
+
+        plain = self.example_graph()
+        snap = plain.snapshot()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # Agg can not show a window
+            GraphAlgo(snap).plot_graph()
+            GraphAlgo(plain.subgraph([0, 2, 3])).plot_graph()
+            assert all(node.location is None for node in plain.get_all_v().values())
+            concurrent = ConcurrentGraph(self.example_graph())
+            GraphAlgo(concurrent).plot_graph()
+            assert all(node.location is not None for node in concurrent.get_all_v().values())
+        plt.close("all")
+
+    def test_condensation(self):
+        graph = self.example_graph()
+        algo = GraphAlgo(graph)
+        cond = algo.condensation()
+        assert cond is algo.condensation()  # Cached while the graph does not change
+
+        assert cond.v_size() == 3 and cond.e_size() == 2
+        assert sorted(sorted(c) for c in cond.components) == [[0, 2, 3], [1, 4, 5], [6]]
+        assert cond.comp_of[0] == cond.comp_of[2] == cond.comp_of[3]
+        assert sorted(cond.sources()) == sorted([cond.comp_of[1], cond.comp_of[6]])
+        assert cond.sinks() == [cond.comp_of[0]]
+        assert cond.to_graph().e_size == 2
+
+        graph.remove_edge(2, 0)
+        assert algo.condensation() is not cond
+        assert algo.condensation().v_size() == 4
+
+        graph = self.make_graph(50, 80)
+        algo = GraphAlgo(graph)
+        cond = algo.condensation()
+        expected = [sorted(node.key for node in scc) for scc in algo.connected_components()]
+        assert sorted(expected) == sorted(sorted(c) for c in cond.components)
+        order = {c: i for i, c in enumerate(cond.topological_order())}
+        for c in range(cond.v_size()):
+            for d in cond.succ[c]:
+                assert order[c] < order[d]
+
+    def test_snapshot_algorithms(self):
+        graph = self.make_graph(30, 60)
+        snap = graph.snapshot()
+        expected = GraphAlgo(graph).connected_components()
+        expected = sorted(sorted(node.key for node in scc) for scc in expected)
+        for key in list(graph.get_all_v())[:10]:
+            graph.remove_node(key)  # The writer keeps changing the graph
+
+        algo = GraphAlgo(snap)
+        actual = sorted(sorted(node.key for node in scc) for scc in algo.connected_components())
+        assert actual == expected
+        assert sorted(sorted(c) for c in algo.condensation().components) == expected
+
+    def test_concurrent_queries(self):
+        from ConcurrentGraph import ConcurrentGraph
+        import threading
+
+        graph = self.make_graph(60, 180)
+        cg = ConcurrentGraph(graph)
+        keys = list(graph.get_all_v())
+        queries = [("shortest_path", (keys[i], keys[-1 - i])) for i in range(30)]
+        queries += [("connected_component", (key,)) for key in keys[:30]]
+        frozen = GraphAlgo(self.copy_graph(graph))  # Reference answers, on a copy that never changes
+        expected = [repr(getattr(frozen, name)(*args)) for name, args in queries]
+        snap = cg.snapshot()
+        errors = []
+
+        def writer(offset: int):
+            for i in range(300):  # Keep changing the graph while the queries run
+                src, dest = keys[(i + offset) % 60], keys[(i * 7 + offset) % 60]
+                if not cg.remove_edge(src, dest):
+                    cg.add_edge(src, dest, 1)
+
+        def reader():
+            try:
+                algo = GraphAlgo(snap)  # The snapshot must not see any of the writers' changes
+                for _ in range(3):
+                    for (name, args), exp in zip(queries, expected):
+                        assert repr(getattr(algo, name)(*args)) == exp
+                    assert len(cg.query_batch(queries, workers=4)) == len(queries)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(3)]
+        threads += [threading.Thread(target=reader) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(errors) == 0, errors
+
+        # The counters of the wrapped graph stay consistent under concurrent writers
+        assert cg.e_size == sum(len(cg.all_out_edges_of_node(key)) for key in keys)
+        assert cg.e_size == sum(len(cg.all_in_edges_of_node(key)) for key in keys)
+
+    def copy_graph(self, graph: object) -> object:
+        g = DiGraph()
+        for key in graph.get_all_v():
+            g.add_node(key)
+        for key in graph.get_all_v():
+            for dest, edge in graph.all_out_edges_of_node(key).items():
+                g.add_edge(key, dest, edge.weight)
+        return g
+
     """Graph creation methods:"""
 
     def graph_creator(self, node_size: int = 0, edge_size: int = 0) -> object:
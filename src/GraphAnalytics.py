@@ -0,0 +1,220 @@
+import heapq
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from GraphAlgo import GraphAlgo
+
+_worker_adjacency = None  # [[(dest index, weight), ..] of every node index] of the graph, in every process of a pool
+
+
+class Centrality(object):
+    """
+     * This class represents the result of a centrality measure: keys[i] is a node id and values[i] its score,
+     * plus stats of the computation (seconds, and iterations / convergence or the sampled sources).
+    """
+
+    def __init__(self, keys: np.ndarray, values: np.ndarray, stats: dict):
+        self.keys = keys
+        self.values = values
+        self.stats = stats
+        self._index = None
+
+    def __getitem__(self, key: int) -> float:
+        if self._index is None:
+            self._index = {k: i for i, k in enumerate(self.keys.tolist())}
+        return float(self.values[self._index[key]])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def to_dict(self) -> dict:
+        """
+        @return: A dictionary of {node_id: score}
+        """
+        return dict(zip(self.keys.tolist(), self.values.tolist()))
+
+    def top(self, k: int) -> list:
+        """
+        @return: The k nodes with the highest scores, as a list of (node_id, score), highest first
+        """
+        order = np.argsort(-self.values, kind="stable")[:k]
+        return list(zip(self.keys[order].tolist(), self.values[order].tolist()))
+
+
+def pagerank(algo: GraphAlgo, damping: float = 0.85, tol: float = 1e-10, max_iter: int = 100,
+             weighted: bool = False) -> Centrality:
+    """
+    * PageRank by power iteration over the sparse (CSR) form of the graph: every step is one sparse matrix-vector product.
+    * The rank of nodes with no out edges (dangling) is spread evenly over all the nodes.
+    @param algo: A GraphAlgo of the graph
+    @param damping: The probability to follow an edge (1 - damping is the probability to jump to a random node)
+    @param tol: The iterations stop once the L1 change of the ranks is below n * tol
+    @param max_iter: The maximal number of iterations
+    @param weighted: True to follow the out edges in proportion to their weights, o.w. evenly
+    @return: A Centrality of the ranks (summing to 1), stats: seconds, iterations, converged, residual
+    """
+    start = time.perf_counter()
+    sg = algo.get_sparse_graph()
+    n = sg.size()
+    keys = np.asarray(sg.keys, dtype=np.int64)
+    if n == 0:
+        return Centrality(keys, np.empty(0), {"seconds": 0.0, "iterations": 0, "converged": True, "residual": 0.0})
+    out = sg.out_csr
+    data = out.data if weighted else np.ones_like(out.data)
+    transition = csr_matrix((data, out.indices, out.indptr), shape=out.shape)
+    out_weight = np.asarray(transition.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    scale = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    transposed = transition.T.tocsr()
+
+    rank = np.full(n, 1.0 / n)
+    residual = float("inf")
+    iterations = 0
+    while iterations < max_iter and residual >= n * tol:
+        spread = damping * transposed.dot(rank * scale)
+        new_rank = spread + (damping * rank[dangling].sum() + 1.0 - damping) / n
+        residual = float(np.abs(new_rank - rank).sum())
+        rank = new_rank
+        iterations += 1
+    return Centrality(keys, rank, {"seconds": time.perf_counter() - start, "iterations": iterations,
+                                   "converged": residual < n * tol, "residual": residual})
+
+
+def _init_worker(adjacency: list):
+    global _worker_adjacency
+    _worker_adjacency = adjacency
+
+
+def _brandes_from(sources: list) -> np.ndarray:
+    """
+    * Brandes' dependency accumulation from the given source indexes, over the worker's adjacency
+    * (Dijkstra, so the weights are taken into account and ties in distance count as separate shortest paths).
+    @return: The partial betweenness of every node index
+    """
+    adjacency = _worker_adjacency
+    ans = np.zeros(len(adjacency))
+    for s in sources:
+        order = []  # Nodes by distance from s
+        preds = {s: []}
+        sigma = {s: 1.0}  # Number of shortest paths from s
+        dist = {s: 0.0}
+        settled = set()
+        heap = [(0.0, s)]
+        while heap:
+            d, v = heapq.heappop(heap)
+            if v in settled:
+                continue
+            settled.add(v)
+            order.append(v)
+            for w, weight in adjacency[v]:
+                if w in settled:
+                    continue
+                nd = d + weight
+                old = dist.get(w)
+                if old is None or nd < old:
+                    dist[w] = nd
+                    sigma[w] = sigma[v]
+                    preds[w] = [v]
+                    heapq.heappush(heap, (nd, w))
+                elif nd == old:
+                    sigma[w] += sigma[v]
+                    preds[w].append(v)
+        delta = dict.fromkeys(order, 0.0)
+        for w in reversed(order):
+            coeff = (1.0 + delta[w]) / sigma[w]
+            for v in preds[w]:
+                delta[v] += sigma[v] * coeff
+            if w != s:
+                ans[w] += delta[w]
+    return ans
+
+
+def betweenness(algo: GraphAlgo, samples: int = None, seed: int = 0, workers: int = None,
+                normalized: bool = True) -> Centrality:
+    """
+    * Betweenness centrality by Brandes' algorithm (weighted, O(|V||E| + |V|^2 log|V|) for all the sources).
+    * With samples, only that many random sources are used and the result is scaled by |V| / samples,
+    * an unbiased estimate of the exact betweenness. The sources are split into chunks that run on a pool of processes.
+    @param algo: A GraphAlgo of the graph
+    @param samples: The number of sampled sources (all the nodes if None)
+    @param seed: The random seed of the sampling
+    @param workers: The number of processes (os.cpu_count() if None), 1 --> in this process
+    @param normalized: True to divide by (n-1)(n-2), the number of ordered pairs of other nodes
+    @return: A Centrality of the betweenness, stats: seconds, sources
+    """
+    start = time.perf_counter()
+    sg = algo.get_sparse_graph()
+    n = sg.size()
+    keys = np.asarray(sg.keys, dtype=np.int64)
+    out = sg.out_csr
+    indices, weights = out.indices.tolist(), out.data.tolist()
+    adjacency = [list(zip(indices[out.indptr[i]:out.indptr[i + 1]], weights[out.indptr[i]:out.indptr[i + 1]]))
+                 for i in range(n)]
+    sources = list(range(n))
+    if samples is not None and samples < n:
+        sources = sorted(random.Random(seed).sample(sources, samples))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    values = np.zeros(n)
+    if workers <= 1 or len(sources) <= 1:
+        _init_worker(adjacency)
+        values = _brandes_from(sources)
+    else:
+        chunks = [sources[i::workers * 4] for i in range(min(workers * 4, len(sources)))]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(adjacency,)) as pool:
+            for partial in pool.map(_brandes_from, chunks):
+                values += partial
+
+    if len(sources) > 0:
+        values *= n / len(sources)
+    if normalized and n > 2:
+        values /= (n - 1) * (n - 2)
+    return Centrality(keys, values, {"seconds": time.perf_counter() - start, "sources": len(sources)})
+
+
+def closeness(algo: GraphAlgo, nodes: list = None, reverse: bool = False) -> Centrality:
+    """
+    * Closeness centrality from the shortest path engine (GraphAlgo._dijkstra_iter), one Dijkstra per node.
+    * For graphs that are not strongly connected the Wasserman-Faust form is used:
+    * closeness(u) = (r / (n-1)) * (r / sum of the distances from u to the r nodes it reaches), 0 if it reaches none.
+    @param algo: A GraphAlgo of the graph
+    @param nodes: The node ids to score (all the nodes if None)
+    @param reverse: True to use the distances into the node (over the in edges) instead of out of it
+    @return: A Centrality of the closeness, stats: seconds
+    """
+    start = time.perf_counter()
+    graph = algo.get_graph()
+    if nodes is None:
+        nodes = list(graph.get_all_v().keys())
+    nodes = [key for key in nodes if graph.get_node(key) is not None]
+    n = len(graph.get_all_v())
+    values = np.zeros(len(nodes))
+    for i, key in enumerate(nodes):
+        total = 0.0
+        reached = -1  # The source itself is yielded first
+        for node, d, prev in algo._dijkstra_iter(key, reverse):
+            total += d
+            reached += 1
+        if reached > 0 and total > 0:
+            values[i] = (reached / (n - 1)) * (reached / total)
+    return Centrality(np.asarray(nodes, dtype=np.int64), values, {"seconds": time.perf_counter() - start})
+
+
+if __name__ == '__main__':
+    # python GraphAnalytics.py <graph json> [betweenness samples]
+    g = GraphAlgo()
+    if len(sys.argv) < 2 or not g.load_from_json(sys.argv[1]):
+        print("Usage: python GraphAnalytics.py <graph.json> [samples]")
+        sys.exit(1)
+    pr = pagerank(g)
+    print("pagerank: {:.3f}s, {} iterations, converged: {}, top 5: {}".format(
+        pr.stats["seconds"], pr.stats["iterations"], pr.stats["converged"], pr.top(5)))
+    bc = betweenness(g, samples=int(sys.argv[2]) if len(sys.argv) > 2 else 100)
+    print("betweenness: {:.3f}s over {} sources, top 5: {}".format(bc.stats["seconds"], bc.stats["sources"], bc.top(5)))
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from DiGraph import DiGraph
+from GraphAlgo import GraphAlgo
+
+
+def _parse_json(file_name: str) -> dict:
+    """
+    * Parses a graph json file (the format of GraphAlgo.load_from_json) into flat arrays.
+    """
+    with open(file_name, 'r') as f:
+        load = json.load(f)
+    nodes = load["Nodes"]
+    edges = load["Edges"]
+    positions = np.full((len(nodes), 3), np.nan)
+    for i, node in enumerate(nodes):
+        if "pos" in node:
+            positions[i] = tuple(map(float, str(node["pos"]).split(",")))
+    return {"ids": np.asarray([node["id"] for node in nodes], dtype=np.int64),
+            "positions": positions,
+            "src": np.asarray([edge["src"] for edge in edges], dtype=np.int64),
+            "dest": np.asarray([edge["dest"] for edge in edges], dtype=np.int64),
+            "w": np.asarray([edge["w"] for edge in edges], dtype=np.float64)}
+
+
+def _load_arrays(file_name: str, cache_file: str) -> (dict, bool):
+    """
+    * Loads the arrays of a graph file from its cache file if the cache is still valid (same path, size and mtime),
+    * o.w. parses the json and rewrites the cache. Runs in the processes of the catalog's pool.
+    @return: The arrays, and True if they came from the cache
+    """
+    stat = os.stat(file_name)
+    key = np.asarray([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+    if os.path.exists(cache_file):
+        try:
+            with np.load(cache_file) as cached:
+                if str(cached["path"]) == os.path.abspath(file_name) and (cached["key"] == key).all():
+                    return {name: cached[name] for name in ("ids", "positions", "src", "dest", "w")}, True
+        except (OSError, ValueError, KeyError):
+            pass  # A broken cache file is rewritten below
+    arrays = _parse_json(file_name)
+    tmp = cache_file + ".{}.tmp".format(os.getpid())
+    with open(tmp, "wb") as f:
+        np.savez(f, path=np.asarray(os.path.abspath(file_name)), key=key, **arrays)
+    os.replace(tmp, cache_file)
+    return arrays, False
+
+
+def _build_graph(arrays: dict) -> DiGraph:
+    graph = DiGraph()
+    positions = arrays["positions"]
+    located = ~np.isnan(positions).any(axis=1)
+    graph.add_nodes_from(arrays["ids"].tolist(),
+                         [tuple(pos) if has_pos else None for pos, has_pos in zip(positions.tolist(), located.tolist())])
+    graph.add_edges_from(arrays["src"].tolist(), arrays["dest"].tolist(), arrays["w"].tolist())
+    return graph
+
+
+class GraphCatalog(object):
+    """
+     * This class represents a catalog of the graph files in a folder (and its sub folders).
+     * Files are loaded into GraphAlgo instances, a few at a time on a pool of processes that parse the json.
+     * Every parsed file is cached as a compact numpy (.npz) file in the cache folder, keyed by the file's path,
+     * size and modification time, so reopening a file that did not change skips the json parsing entirely.
+    """
+
+    def __init__(self, folder: str, cache_folder: str = None):
+        """
+        @param folder: The folder of the graph files
+        @param cache_folder: Where to keep the parse cache (folder/.graph_cache if None)
+        """
+        self.folder = folder
+        self.cache_folder = cache_folder if cache_folder is not None else os.path.join(folder, ".graph_cache")
+        self.cache_hits = 0  # Number of files loaded from the cache, since the catalog was created
+        self._names = []  # Paths relative to folder (the cache is validated against the file when loading)
+        self.refresh()
+
+    def refresh(self):
+        """
+        * Re-indexes the folder. Files that start with a dot (like the cache folder) are skipped.
+        """
+        self._names = []
+        cache = os.path.abspath(self.cache_folder)
+        for root, dirs, files in os.walk(self.folder):
+            dirs[:] = sorted(d for d in dirs if not d.startswith(".") and os.path.abspath(os.path.join(root, d)) != cache)
+            for name in sorted(files):
+                if name.startswith("."):
+                    continue
+                self._names.append(os.path.relpath(os.path.join(root, name), self.folder))
+
+    def names(self) -> list:
+        """
+        @return: The names of all the files in the catalog (paths relative to the folder)
+        """
+        return list(self._names)
+
+    def get(self, name: str) -> GraphAlgo:
+        """
+        * Loads a single graph file (in this process).
+        @param name: A name from names()
+        @return: A GraphAlgo of the graph, None if the file could not be loaded
+        """
+        return self.load([name], workers=1).get(name)
+
+    def load(self, names: list = None, workers: int = None) -> dict:
+        """
+        * Loads the given graph files, concurrently on a pool of processes.
+        @param names: Names from names() (all the files of the catalog if None)
+        @param workers: The number of processes (os.cpu_count() if None), 1 --> in this process
+        @return: A dictionary of {name: GraphAlgo}, files that could not be loaded are left out
+        """
+        if names is None:
+            names = self.names()
+        os.makedirs(self.cache_folder, exist_ok=True)
+        paths = [os.path.join(self.folder, name) for name in names]
+        caches = [self._cache_file(path) for path in paths]
+        if workers is None:
+            workers = os.cpu_count() or 1
+        results = []
+        if workers <= 1 or len(names) <= 1:
+            for path, cache in zip(paths, caches):
+                try:
+                    results.append(_load_arrays(path, cache))
+                except Exception as e:
+                    results.append(e)
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(names))) as pool:
+                futures = [pool.submit(_load_arrays, path, cache) for path, cache in zip(paths, caches)]
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        results.append(e)
+        ans = dict()
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):  # Not a graph file
+                continue
+            arrays, from_cache = result
+            self.cache_hits += 1 if from_cache else 0
+            ans[name] = GraphAlgo(_build_graph(arrays))
+        return ans
+
+    def _cache_file(self, path: str) -> str:
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_folder, digest + ".npz")
@@ -0,0 +1,141 @@
+import json
+import zlib
+
+from DiGraph import DiGraph
+from GraphInterface import GraphInterface
+
+
+def _position(node) -> list:
+    location = node.location
+    return None if location is None else [location.x, location.y, location.z]
+
+
+def _fingerprint(graph: GraphInterface):
+    return graph.fingerprint() if isinstance(graph, DiGraph) else None
+
+
+class GraphPatch(object):
+    """
+     * This class represents the changes that turn one version of a graph into another (see diff()):
+     * removed_nodes - [id], added_nodes - [(id, pos or None)], moved_nodes - [(id, pos or None)],
+     * removed_edges - [(src, dest)], added_edges - [(src, dest, w)], weights - [(src, dest, old w, new w)].
+     * The edges of removed nodes are not listed, removing the node removes them.
+     * base / target are the fingerprints of the two versions (None if they were not DiGraphs),
+     * so a patch is only applied to the version it was made from.
+    """
+
+    def __init__(self, base: int = None, target: int = None):
+        self.base = base
+        self.target = target
+        self.removed_nodes = []
+        self.added_nodes = []
+        self.moved_nodes = []
+        self.removed_edges = []
+        self.added_edges = []
+        self.weights = []
+
+    def __len__(self):
+        return (len(self.removed_nodes) + len(self.added_nodes) + len(self.moved_nodes) + len(self.removed_edges)
+                + len(self.added_edges) + len(self.weights))
+
+    def is_empty(self) -> bool:
+        return len(self) == 0
+
+    def to_dict(self) -> dict:
+        """
+        * The patch as flat lists of numbers (the old weights are left out, they are not needed to apply it).
+        """
+        return {"base": self.base, "target": self.target, "removed_nodes": self.removed_nodes,
+                "added_nodes": [[key, pos] for key, pos in self.added_nodes],
+                "moved_nodes": [[key, pos] for key, pos in self.moved_nodes],
+                "removed_edges": [[src, dest] for src, dest in self.removed_edges],
+                "added_edges": [[src, dest, w] for src, dest, w in self.added_edges],
+                "weights": [[src, dest, new] for src, dest, old, new in self.weights]}
+
+    @staticmethod
+    def from_dict(d: dict):
+        patch = GraphPatch(d.get("base"), d.get("target"))
+        patch.removed_nodes = list(d["removed_nodes"])
+        patch.added_nodes = [(key, pos) for key, pos in d["added_nodes"]]
+        patch.moved_nodes = [(key, pos) for key, pos in d["moved_nodes"]]
+        patch.removed_edges = [(src, dest) for src, dest in d["removed_edges"]]
+        patch.added_edges = [(src, dest, w) for src, dest, w in d["added_edges"]]
+        patch.weights = [(src, dest, None, w) for src, dest, w in d["weights"]]
+        return patch
+
+    def to_bytes(self) -> bytes:
+        """
+        * Serializes the patch as compact json, compressed with zlib.
+        """
+        return zlib.compress(json.dumps(self.to_dict(), separators=(",", ":")).encode("utf-8"))
+
+    @staticmethod
+    def from_bytes(data: bytes):
+        return GraphPatch.from_dict(json.loads(zlib.decompress(data).decode("utf-8")))
+
+    def __repr__(self):
+        return "GraphPatch(-{} +{} ~{} nodes, -{} +{} ~{} edges)".format(
+            len(self.removed_nodes), len(self.added_nodes), len(self.moved_nodes),
+            len(self.removed_edges), len(self.added_edges), len(self.weights))
+
+
+def diff(g1: GraphInterface, g2: GraphInterface) -> GraphPatch:
+    """
+    * Finds the changes from g1 to g2 in O(|V|+|E|): every node of g1 and g2 is looked up in the other graph's
+    * nodes dictionary, and the out edges of every common node are compared by hashed lookups in the other graph's
+    * adjacency dictionary. Adjacency dictionaries that are shared (e.g. a graph and its snapshot) are skipped in O(1).
+    @param g1: The old version
+    @param g2: The new version
+    @return: A GraphPatch, apply_patch(g1, patch) turns g1 into g2
+    """
+    patch = GraphPatch(_fingerprint(g1), _fingerprint(g2))
+    nodes1, nodes2 = g1.get_all_v(), g2.get_all_v()
+    for key, node in nodes1.items():
+        other = nodes2.get(key)
+        if other is None:
+            patch.removed_nodes.append(key)
+            continue
+        if node is not other and node.location != other.location:
+            patch.moved_nodes.append((key, _position(other)))
+        out1, out2 = g1.all_out_edges_of_node(key), g2.all_out_edges_of_node(key)
+        if out1 is out2:
+            continue
+        for dest, edge in out1.items():
+            other_edge = out2.get(dest)
+            if other_edge is None:
+                if dest in nodes2:  # Edges of removed nodes go with them
+                    patch.removed_edges.append((key, dest))
+            elif other_edge.weight != edge.weight:
+                patch.weights.append((key, dest, edge.weight, other_edge.weight))
+        for dest, edge in out2.items():
+            if dest not in out1:
+                patch.added_edges.append((key, dest, edge.weight))
+    for key, node in nodes2.items():
+        if key not in nodes1:
+            patch.added_nodes.append((key, _position(node)))
+            for dest, edge in g2.all_out_edges_of_node(key).items():
+                patch.added_edges.append((key, dest, edge.weight))
+    return patch
+
+
+def apply_patch(graph: DiGraph, patch: GraphPatch) -> bool:
+    """
+    * Applies a patch made by diff() to the graph, in place.
+    @param graph: The graph, it must be the version the patch was made from (checked by fingerprint when known)
+    @param patch: The patch
+    @return: True if the patch was applied, False if the graph is not the base version of the patch (nothing changed)
+    """
+    if patch.base is not None and graph.fingerprint() != patch.base:
+        return False
+    for src, dest in patch.removed_edges:
+        graph.remove_edge(src, dest)
+    for key in patch.removed_nodes:
+        graph.remove_node(key)
+    for key, pos in patch.added_nodes:
+        graph.add_node(key, None if pos is None else tuple(pos))
+    for key, pos in patch.moved_nodes:
+        graph.set_node_location(key, None if pos is None else tuple(pos))
+    for src, dest, w in patch.added_edges:
+        graph.add_edge(src, dest, w)
+    graph.update_edge_weights((src, dest, new) for src, dest, old, new in patch.weights)
+    return True
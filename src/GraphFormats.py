@@ -0,0 +1,259 @@
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from array import array
+
+from DiGraph import DiGraph
+
+CHUNK_SIZE = 1 << 22  # Characters read from a file at a time
+_COMMENTS = ("#", "%")
+_ROWS = {}  # {columns: regex of lines of columns tokens}, see _rows()
+
+
+def _chunks(file, chunk_size: int):
+    """
+    * Yields the text of a file in blocks of about chunk_size characters, every block ends at the end of a line.
+    """
+    rest = ""
+    while True:
+        block = file.read(chunk_size)
+        if not block:
+            if rest:
+                yield rest + "\n"
+            return
+        block = rest + block
+        cut = block.rfind("\n") + 1
+        rest = block[cut:]
+        if cut:
+            yield block[:cut]
+
+
+def _parse_lines(chunk: str, src: array, dest: array, weights: array, nodes: list, one_based: bool):
+    """
+    * Parses a block of "src dest [weight]" lines line by line, the slow path of _parse_chunk:
+    * comments and blank lines are skipped, a single id is a node without edges, a missing weight is 1.
+    """
+    shift = 1 if one_based else 0
+    for line in chunk.splitlines():
+        tokens = line.split()
+        if not tokens or tokens[0].startswith(_COMMENTS):
+            continue
+        if len(tokens) == 1:
+            nodes.append(int(tokens[0]) - shift)
+            continue
+        src.append(int(tokens[0]) - shift)
+        dest.append(int(tokens[1]) - shift)
+        weights.append(float(tokens[2]) if len(tokens) > 2 else 1.0)
+
+
+def _rows(columns: int):
+    """
+    * Returns a regex that matches a block of lines of exactly columns tokens each.
+    """
+    rows = _ROWS.get(columns)
+    if rows is None:
+        rows = _ROWS[columns] = re.compile(r"(?:[ \t]*" + r"[ \t]+".join([r"\S+"] * columns) + r"[ \t]*\r?\n)*")
+    return rows
+
+
+def _parse_chunk(chunk: str, src: array, dest: array, weights: array, nodes: list, columns: int,
+                 one_based: bool = False):
+    """
+    * Parses a block of lines of columns tokens ("src dest weight" or "src dest") into the arrays.
+    * A block is first matched as a whole against a regex of lines of exactly columns tokens each, and then split once,
+    * and every column is converted by a single map() over a slice of the tokens, so no Python code runs per line.
+    * Blocks with comments, blank lines or a different number of tokens on any line go through _parse_lines.
+    """
+    if "#" in chunk or "%" in chunk or _rows(columns).fullmatch(chunk) is None:
+        _parse_lines(chunk, src, dest, weights, nodes, one_based)
+        return
+    tokens = chunk.split()
+    n = len(src)
+    src.extend(map(int, tokens[0::columns]))
+    dest.extend(map(int, tokens[1::columns]))
+    if columns > 2:
+        weights.extend(map(float, tokens[2::columns]))
+    else:
+        weights.extend([1.0] * (len(tokens) // columns))
+    if one_based:
+        src[n:] = array('q', [key - 1 for key in src[n:]])
+        dest[n:] = array('q', [key - 1 for key in dest[n:]])
+
+
+def _build(nodes, src: array, dest: array, weights: array) -> DiGraph:
+    graph = DiGraph()
+    ids = dict.fromkeys(nodes)
+    ids.update(dict.fromkeys(src))
+    ids.update(dict.fromkeys(dest))
+    graph.add_nodes_from(ids)
+    graph.add_edges_from(src, dest, weights)
+    return graph
+
+
+def read_json(file_name: str) -> DiGraph:
+    """
+    * Reads a graph from the json format of GraphAlgo.load_from_json: {"Nodes": [{"id", "pos": "x,y,z"}],
+    * "Edges": [{"src", "w", "dest"}]}.
+    @param file_name: The path to the json file
+    @return: The graph
+    """
+    with open(file_name, 'r') as jsonFile:
+        load = json.load(jsonFile)
+    graph = DiGraph()
+    for node in load["Nodes"]:
+        if "pos" in node:
+            graph.add_node(node_id=node["id"], pos=tuple(map(float, str(node["pos"]).split(","))))
+        else:
+            graph.add_node(node_id=node["id"])
+    for edge in load["Edges"]:
+        graph.add_edge(id1=edge["src"], id2=edge["dest"], weight=edge["w"])
+    return graph
+
+
+def write_json(graph, file_name: str) -> None:
+    """
+    * Writes a graph in the json format of GraphAlgo.save_to_json (see read_json).
+    """
+    d = {"Edges": [], "Nodes": []}
+    for src in graph.get_all_v().keys():
+        for dst, w in graph.all_out_edges_of_node(src).items():
+            d["Edges"].append({"src": src, "w": w.weight, "dest": dst})
+    for key, value in graph.get_all_v().items():
+        if value.location is None:
+            d["Nodes"].append({"id": key})
+        else:
+            d["Nodes"].append({"pos": str(value.location), "id": key})
+    s = d.__str__()
+    s = s.replace(" ", "")
+    s = s.replace("'", "\"")
+    with open(file_name, "w") as jsonFile:
+        jsonFile.write(s)
+
+
+def read_edge_list(file_name: str, chunk_size: int = CHUNK_SIZE) -> DiGraph:
+    """
+    * Reads a graph from a whitespace separated edge list: a line "src dest [weight]" per edge (weight 1 if missing),
+    * a line with a single id per node without edges, and comment lines that start with # or %.
+    * The nodes are the ids that appear in the file (an edge list has no positions).
+    @param file_name: The path to the file
+    @param chunk_size: The number of characters parsed at a time
+    @return: The graph
+    """
+    src, dest, weights, nodes = array('q'), array('q'), array('d'), []
+    columns = 0
+    with open(file_name, 'r') as file:
+        for chunk in _chunks(file, chunk_size):
+            if not columns:  # The number of columns of the first edge line
+                for line in chunk.splitlines():
+                    tokens = line.split()
+                    if len(tokens) > 1 and not tokens[0].startswith(_COMMENTS):
+                        columns = min(len(tokens), 3)
+                        break
+            _parse_chunk(chunk, src, dest, weights, nodes, columns or 3)
+    return _build(nodes, src, dest, weights)
+
+
+def write_edge_list(graph, file_name: str) -> None:
+    """
+    * Writes a graph as an edge list (see read_edge_list): a "src dest weight" line per edge,
+    * after a line per node without edges. The positions of the nodes are not written.
+    """
+    with open(file_name, 'w') as file:
+        file.write("".join(f"{key}\n" for key in graph.get_all_v()
+                           if not graph.all_out_edges_of_node(key) and not graph.all_in_edges_of_node(key)))
+        for src in graph.get_all_v():
+            edges = graph.all_out_edges_of_node(src)
+            if edges:
+                file.write("".join([f"{src} {dest} {edge.weight!r}\n" for dest, edge in edges.items()]))
+
+
+def read_mtx(file_name: str, chunk_size: int = CHUNK_SIZE) -> DiGraph:
+    """
+    * Reads a graph from a Matrix Market coordinate file: entry (i, j, value) is an edge from node i-1 to node j-1
+    * with weight value (1 for a pattern matrix), and the nodes are 0..max(rows, cols)-1.
+    * A symmetric matrix adds the edges in both directions. Entries on the diagonal (self loops) and with a
+    * negative value are skipped, as by DiGraph.add_edge.
+    @param file_name: The path to the file
+    @param chunk_size: The number of characters parsed at a time
+    @return: The graph
+    """
+    src, dest, weights, nodes = array('q'), array('q'), array('d'), []
+    with open(file_name, 'r') as file:
+        header = file.readline().split()
+        if len(header) != 5 or header[0].lower() != "%%matrixmarket" or header[1].lower() != "matrix":
+            raise ValueError("{} is not a Matrix Market matrix".format(file_name))
+        layout, field, symmetry = (h.lower() for h in header[2:])
+        if layout != "coordinate" or field not in ("real", "integer", "pattern") \
+                or symmetry not in ("general", "symmetric"):
+            raise ValueError("Unsupported Matrix Market matrix: {}".format(" ".join(header[2:])))
+        line = file.readline()
+        while line and (not line.strip() or line.startswith("%")):
+            line = file.readline()
+        rows, cols, entries = map(int, line.split())
+        columns = 2 if field == "pattern" else 3
+        for chunk in _chunks(file, chunk_size):
+            _parse_chunk(chunk, src, dest, weights, nodes, columns, one_based=True)
+    if len(src) != entries:
+        raise ValueError("{} has {} entries, expected {}".format(file_name, len(src), entries))
+    if symmetry == "symmetric":
+        src, dest, weights = src + dest, dest + src, weights + weights
+    return _build(range(max(rows, cols)), src, dest, weights)
+
+
+def write_mtx(graph, file_name: str) -> None:
+    """
+    * Writes a graph as a real general Matrix Market coordinate matrix (see read_mtx) of max(id)+1 rows and columns,
+    * edge (src, dest, w) is the entry (src+1, dest+1, w). The positions of the nodes are not written, and the
+    * missing ids below the largest one are read back as nodes without edges.
+    @raise ValueError: If the graph has a negative node id
+    """
+    keys = graph.get_all_v().keys()
+    if keys and min(keys) < 0:
+        raise ValueError("Matrix Market can not hold negative node ids")
+    size = max(keys) + 1 if keys else 0
+    with open(file_name, 'w') as file:
+        file.write("%%MatrixMarket matrix coordinate real general\n")
+        file.write("{} {} {}\n".format(size, size, graph.e_size))
+        for src in keys:
+            edges = graph.all_out_edges_of_node(src)
+            if edges:
+                file.write("".join([f"{src + 1} {dest + 1} {edge.weight!r}\n" for dest, edge in edges.items()]))
+
+
+def benchmark(json_file: str) -> dict:
+    """
+    * Loads the same graph from json, an edge list and a Matrix Market file (written to a temporary folder),
+    * and returns {format: (seconds, edges per second)}.
+    """
+    from GraphAlgo import GraphAlgo
+
+    algo = GraphAlgo()
+    start = time.perf_counter()
+    if not algo.load_from_json(json_file):
+        raise ValueError("Can not load {}".format(json_file))
+    ans = {"json": time.perf_counter() - start}
+    graph = algo.get_graph()
+    with tempfile.TemporaryDirectory() as folder:
+        for name, write, read in [("edge list", write_edge_list, read_edge_list), ("mtx", write_mtx, read_mtx)]:
+            path = os.path.join(folder, "graph")
+            write(graph, path)
+            start = time.perf_counter()
+            loaded = read(path)
+            ans[name] = time.perf_counter() - start
+            if loaded.e_size != graph.e_size:
+                raise ValueError("{} lost edges: {} of {}".format(name, loaded.e_size, graph.e_size))
+    return {name: (seconds, graph.e_size / seconds if seconds > 0 else float('inf')) for name, seconds in ans.items()}
+
+
+if __name__ == '__main__':
+    # python GraphFormats.py <graph json> [<graph json> ..]
+    if len(sys.argv) < 2:
+        print("Usage: python GraphFormats.py <graph.json> [<graph.json> ..]")
+        sys.exit(1)
+    for json_file in sys.argv[1:]:
+        print(json_file)
+        for name, (seconds, rate) in benchmark(json_file).items():
+            print("  {:<10} {:.3f}s  {:,.0f} edges/s".format(name, seconds, rate))
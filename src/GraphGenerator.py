@@ -0,0 +1,170 @@
+import math
+import sys
+
+import numpy as np
+
+FAMILIES = ("no_pos", "on_circle", "random_pos", "power_law", "grid")
+
+
+class GeneratedGraph(object):
+    """
+     * This class represents a generated graph in array form: node ids 0..n-1, optional positions (n x 3)
+     * and the edges as three parallel arrays (src, dest, w), sorted by src.
+     * The edges have no self loops and no duplicates, so every edge is accepted by DiGraph.add_edge.
+    """
+
+    def __init__(self, n_nodes: int, positions, src, dest, w):
+        self.n_nodes = n_nodes
+        self.positions = positions
+        self.src = src
+        self.dest = dest
+        self.w = w
+
+    def e_size(self) -> int:
+        return len(self.src)
+
+    def write_json(self, file_name: str, chunk: int = 100000):
+        """
+        * Streams the graph to a file in the json format of GraphAlgo.save_to_json / load_from_json,
+        * chunk by chunk, without building a DiGraph (or the whole json text) in memory.
+        """
+        with open(file_name, "w") as f:
+            f.write('{"Edges":[')
+            for start in range(0, len(self.src), chunk):
+                end = min(start + chunk, len(self.src))
+                if start > 0:
+                    f.write(",")
+                f.write(",".join('{"src":%d,"w":%r,"dest":%d}' % e for e in zip(self.src[start:end].tolist(),
+                                                                                   self.w[start:end].tolist(),
+                                                                                   self.dest[start:end].tolist())))
+            f.write('],"Nodes":[')
+            for start in range(0, self.n_nodes, chunk):
+                end = min(start + chunk, self.n_nodes)
+                if start > 0:
+                    f.write(",")
+                if self.positions is None:
+                    f.write(",".join('{"id":%d}' % i for i in range(start, end)))
+                else:
+                    f.write(",".join('{"pos":"%r,%r,%r","id":%d}' % (x, y, z, i) for i, (x, y, z)
+                                     in enumerate(self.positions[start:end].tolist(), start)))
+            f.write("]}")
+
+    def write_binary(self, file_name: str):
+        """
+        * Saves the graph arrays as a numpy .npz file (n_nodes, positions if any, src, dest, w).
+        """
+        arrays = {"n_nodes": np.asarray([self.n_nodes]), "src": self.src, "dest": self.dest, "w": self.w}
+        if self.positions is not None:
+            arrays["positions"] = self.positions
+        with open(file_name, "wb") as f:
+            np.savez(f, **arrays)
+
+    @staticmethod
+    def read_binary(file_name: str):
+        """
+        * Loads a graph saved by write_binary.
+        """
+        with np.load(file_name) as data:
+            positions = data["positions"] if "positions" in data.files else None
+            return GeneratedGraph(int(data["n_nodes"][0]), positions, data["src"], data["dest"], data["w"])
+
+
+def generate(family: str, n_nodes: int, n_edges: int = None, seed: int = 0) -> GeneratedGraph:
+    """
+    * Generates a random graph of the given family, fully vectorized (numpy) and deterministic by seed:
+    * no_pos / on_circle / random_pos - the families of the data folder: uniform random edges, with no positions,
+    *     positions evenly spread on the unit circle or uniform positions in the unit square.
+    * power_law - edges between nodes picked by Chung-Lu weights (node i has weight ~ (i+1)^(-1/(gamma-1)), gamma=2.5),
+    *     so the degrees follow a power law.
+    * grid - a square grid, every node is connected both ways to its 4 neighbors (n_edges is ignored).
+    * The weights are uniform in [0.1, 81.4), as in the data folder.
+    @param family: One of FAMILIES
+    @param n_nodes: The number of nodes
+    @param n_edges: The number of edges (8 * n_nodes if None, like the data folder), at most n*(n-1)
+    @param seed: The random seed
+    @return: A GeneratedGraph
+    @raise ValueError: If the family is unknown, or power_law could not draw n_edges distinct edges (see _unique_edges)
+    """
+    if family not in FAMILIES:
+        raise ValueError("Unknown family {}, expected one of {}".format(family, FAMILIES))
+    rng = np.random.default_rng(seed)
+    if n_edges is None:
+        n_edges = 8 * n_nodes
+    n_edges = max(0, min(n_edges, n_nodes * (n_nodes - 1)))
+    positions = None
+
+    if family == "grid":
+        side = math.ceil(math.sqrt(n_nodes))
+        ids = np.arange(n_nodes, dtype=np.int64)
+        row, col = ids // side, ids % side
+        positions = np.stack([col.astype(np.float64), row.astype(np.float64), np.zeros(n_nodes)], axis=1)
+        right = ids[(col + 1 < side) & (ids + 1 < n_nodes)]
+        down = ids[ids + side < n_nodes]
+        src = np.concatenate([right, right + 1, down, down + side])
+        dest = np.concatenate([right + 1, right, down + side, down])
+        order = np.lexsort((dest, src))
+        src, dest = src[order], dest[order]
+        return GeneratedGraph(n_nodes, positions, src, dest, rng.uniform(0.1, 81.4, len(src)))
+
+    if family == "on_circle":
+        angles = 2 * np.pi * np.arange(n_nodes) / max(n_nodes, 1)
+        positions = np.stack([np.cos(angles), np.sin(angles), np.zeros(n_nodes)], axis=1)
+    elif family == "random_pos":
+        positions = np.concatenate([rng.random((n_nodes, 2)), np.zeros((n_nodes, 1))], axis=1)
+
+    if family == "power_law":
+        weights = (np.arange(n_nodes) + 1.0) ** (-1 / (2.5 - 1))
+        cumulative = np.cumsum(weights / weights.sum())
+
+        def endpoints(size):
+            return np.minimum(np.searchsorted(cumulative, rng.random(size)), n_nodes - 1)
+    else:
+        def endpoints(size):
+            return rng.integers(0, n_nodes, size, dtype=np.int64)
+
+    src, dest = _unique_edges(n_nodes, n_edges, endpoints, None if family == "power_law" else rng)
+    return GeneratedGraph(n_nodes, positions, src, dest, rng.uniform(0.1, 81.4, len(src)))
+
+
+def _unique_edges(n_nodes: int, n_edges: int, endpoints, rng=None) -> (np.ndarray, np.ndarray):
+    """
+    * Draws edges with the given endpoints sampler until there are n_edges distinct ones with no self loops.
+    * The edges are kept in the order they were drawn (so the result does not depend on the sort), then sorted by src.
+    * A dense graph may still miss a few edges after 50 rounds (the last ones are rarely drawn). With a uniform
+    * sampler (rng given), the missing edges are then picked uniformly from the edges that were not drawn.
+    @param rng: The generator of a uniform sampler, None for any other sampler
+    @raise ValueError: If there are still fewer than n_edges distinct edges after 50 rounds and the sampler is not
+    *                   uniform (e.g. power_law asked for an almost complete graph)
+    """
+    keys = np.empty(0, dtype=np.int64)  # src * n + dest of the distinct edges, in drawing order
+    rounds = 0
+    while len(keys) < n_edges and rounds < 50:
+        missing = n_edges - len(keys)
+        size = int(missing * 1.1) + 16
+        src, dest = endpoints(size), endpoints(size)
+        drawn = (src * n_nodes + dest)[src != dest]
+        keys = np.concatenate([keys, drawn])
+        unique, first = np.unique(keys, return_index=True)
+        keys = keys[np.sort(first)]
+        rounds += 1
+    if len(keys) < n_edges:
+        if rng is None:
+            raise ValueError("Only {} distinct edges of {} were drawn, the graph is too dense for this family"
+                             .format(len(keys), n_edges))
+        every = np.arange(n_nodes * n_nodes, dtype=np.int64)
+        rest = np.setdiff1d(every[every // n_nodes != every % n_nodes], keys)
+        keys = np.concatenate([keys, rng.choice(rest, n_edges - len(keys), replace=False)])
+    keys = np.sort(keys[:n_edges])
+    return keys // n_nodes, keys % n_nodes
+
+
+if __name__ == '__main__':
+    # python GraphGenerator.py <family> <nodes> <edges> <seed> <out file (.json or .npz)>
+    if len(sys.argv) != 6:
+        print("Usage: python GraphGenerator.py <{}> <nodes> <edges> <seed> <out.json|out.npz>".format("|".join(FAMILIES)))
+        sys.exit(1)
+    g = generate(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]))
+    if sys.argv[5].endswith(".npz"):
+        g.write_binary(sys.argv[5])
+    else:
+        g.write_json(sys.argv[5])
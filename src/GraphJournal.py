@@ -0,0 +1,165 @@
+import json
+import os
+
+import GraphFormats
+from DiGraph import DiGraph
+
+
+class GraphJournal(object):
+    """
+     * This class represents an append-only journal of the changes made to a DiGraph, for incremental persistence.
+     * The graph is persisted as a base file (the regular json format of save_to_json) plus a journal file
+     * with one json line per change (NDJSON), stamped with the graph's mc after the change:
+     *   {"op": "base", "mc": 120}                        <-- first line, the mc of the graph saved in the base file
+     *   {"op": "add_edge", "mc": 121, "src": 0, "dest": 3, "w": 1.5}
+     *   {"op": "remove_node", "mc": 122, "id": 7}
+     * So persisting a change costs O(change) instead of rewriting the whole graph.
+     * Every compact_every changes, the journal is compacted: the graph is saved as the new base and the journal restarts.
+     * The graph is recovered by loading the base file and replaying the journal on it.
+    """
+
+    def __init__(self, journal_file: str, base_file: str, compact_every: int = 100000, fsync: bool = False):
+        """
+        @param journal_file: The path of the journal (NDJSON) file
+        @param base_file: The path of the base (json) file
+        @param compact_every: The number of changes after which the journal is compacted (0 --> never)
+        @param fsync: True to force every change to the disk, o.w. changes are flushed to the OS only
+        """
+        self.journal_file = journal_file
+        self.base_file = base_file
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._graph = None
+        self._file = None
+        self._count = 0  # Changes recorded since the last compaction
+
+    def attach(self, graph: DiGraph):
+        """
+        * Starts journaling the given graph. The graph is saved as the base right away,
+        * so base + journal always represent the graph.
+        """
+        self._graph = graph
+        self.compact()
+        graph.journal = self
+
+    def detach(self):
+        """
+        * Stops journaling, the base and the journal stay on the disk.
+        """
+        if self._graph is not None:
+            self._graph.journal = None
+            self._graph = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    close = detach
+
+    def recover(self) -> DiGraph:
+        """
+        * Rebuilds the graph from the base file and the journal, and continues journaling it.
+        * A torn last line (from a crash in the middle of a write) is cut off the journal before appending to it.
+        @return: The recovered graph
+        @raise ValueError: If the base file exists but can not be loaded (the journal is not attached then,
+        *                  so the base file is never compacted over)
+        """
+        graph = DiGraph()
+        if os.path.exists(self.base_file):
+            try:
+                graph = GraphFormats.read_json(self.base_file)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                raise ValueError("Can not load the base file {}: {}".format(self.base_file, e)) from e
+        count = 0
+        end = 0  # The end of the last complete entry in the journal
+        newline = True  # True if that entry ends with a newline
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'rb') as journal:
+                for line in journal:
+                    if len(line.strip()) > 0:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            break  # A torn last line
+                        if entry["op"] == "base":
+                            graph.mc_size = entry["mc"]
+                        else:
+                            self.apply(graph, entry)
+                            count += 1
+                    end += len(line)
+                    newline = line.endswith(b"\n")
+            with open(self.journal_file, 'r+b') as journal:
+                journal.truncate(end)
+        self._graph = graph
+        self._count = count
+        graph.journal = self
+        self._file = open(self.journal_file, 'a')
+        if not newline:
+            self._file.write("\n")
+            self._file.flush()
+        return graph
+
+    def record(self, op: str, **fields):
+        """
+        * Appends a change of the attached graph to the journal (called by DiGraph on every successful change).
+        """
+        entry = {"op": op, "mc": self._graph.get_mc()}
+        entry.update(fields)
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._count += 1
+        if 0 < self.compact_every <= self._count:
+            self.compact()
+
+    def compact(self) -> bool:
+        """
+        * Saves the attached graph as the new base file and restarts the journal from it.
+        * Both files are written aside and then renamed over the old ones. If a crash happens between the two renames,
+        * the old journal is replayed over the new base, which ends in the same graph, since every change in the journal
+        * sets the final state of the node or edge it touches.
+        * If the new base can not be written, the base and the journal are left as they are (and compaction is retried
+        * on the next change).
+        @return: True if the journal was compacted, False o.w.
+        """
+        try:
+            GraphFormats.write_json(self._graph, self.base_file + ".tmp")
+            with open(self.journal_file + ".tmp", 'w') as journal:
+                journal.write(json.dumps({"op": "base", "mc": self._graph.get_mc()}, separators=(",", ":")) + "\n")
+        except OSError as e:
+            print(e)
+            print("compaction failed")
+            for tmp in (self.base_file + ".tmp", self.journal_file + ".tmp"):
+                if os.path.isfile(tmp):
+                    os.remove(tmp)
+            if self._file is None:  # Attaching, there is no journal to append to yet
+                raise
+            return False
+        if self._file is not None:
+            self._file.close()
+        os.replace(self.base_file + ".tmp", self.base_file)
+        os.replace(self.journal_file + ".tmp", self.journal_file)
+        self._count = 0
+        self._file = open(self.journal_file, 'a')
+        return True
+
+    @staticmethod
+    def apply(graph: DiGraph, entry: dict):
+        """
+        * Applies a single journal entry to the graph.
+        """
+        op = entry["op"]
+        if op == "add_node":
+            pos = entry.get("pos")
+            graph.add_node(entry["id"], tuple(pos) if pos is not None else None)
+        elif op == "remove_node":
+            graph.remove_node(entry["id"])
+        elif op == "add_edge":
+            graph.add_edge(entry["src"], entry["dest"], entry["w"])
+        elif op == "remove_edge":
+            graph.remove_edge(entry["src"], entry["dest"])
+        elif op == "update_edge_weights":
+            graph.update_edge_weights(entry["edges"])
+        elif op == "set_node_location":
+            pos = entry.get("pos")
+            graph.set_node_location(entry["id"], tuple(pos) if pos is not None else None)
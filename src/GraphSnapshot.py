@@ -0,0 +1,84 @@
+from GraphInterface import GraphInterface
+
+MISSING = object()  # Marks a node that did not exist when the snapshot was taken
+
+
+class GraphSnapshot(GraphInterface):
+    """
+     * This class represents a read only view of a DiGraph, pinned to the version (mc) it was taken at.
+     * Taking a snapshot is O(1): the view shares the graph's dictionaries.
+     * Before the graph changes a node or an adjacency dictionary for the first time after a snapshot was taken,
+     * it hands the old object over to the snapshot (see DiGraph._preserve_*) and continues on a copy (copy-on-write),
+     * so the snapshot reads its own preserved objects first and the shared dictionaries otherwise.
+     * The memory of a snapshot only grows with the changes made to the graph after it was taken.
+     * Note: all the methods that change the graph do nothing and return False.
+    """
+
+    def __init__(self, graph):
+        self._graph = graph
+        self._nodes = dict()  # {node_id: NodeData or MISSING} as they were at the snapshot
+        self._out = dict()  # {node_id: out edges dict or MISSING} as they were at the snapshot
+        self._in = dict()  # {node_id: in edges dict or MISSING} as they were at the snapshot
+        self._all_v = None
+        self.v_size = graph.v_size
+        self.e_size = graph.e_size
+        self.mc_size = graph.get_mc()
+
+    def get_mc(self) -> int:
+        """
+        @return: The version of the graph this snapshot is pinned to.
+        """
+        return self.mc_size
+
+    def get_node(self, key):
+        # The live graph is read first: the graph preserves an object before changing it,
+        # so if nothing was preserved after the live read, the live read was still valid.
+        node = self._graph.nodes.get(key)
+        preserved = self._nodes.get(key, None)
+        if preserved is None:
+            return node
+        return None if preserved is MISSING else preserved
+
+    def get_all_v(self) -> dict:
+        """
+        * return a dictionary of all the nodes in the snapshot, each node is represented using a pair
+        * (node_id, node_data). The dictionary is built on the first call.
+        """
+        if self._all_v is None:
+            nodes = dict(self._graph.nodes)
+            for key, node in list(self._nodes.items()):
+                if node is MISSING:
+                    nodes.pop(key, None)
+                else:
+                    nodes[key] = node
+            self._all_v = nodes
+        return self._all_v
+
+    def all_in_edges_of_node(self, id1: int) -> dict:
+        return self._edges(self._in, self._graph.in_edges, id1)
+
+    def all_out_edges_of_node(self, id1: int) -> dict:
+        return self._edges(self._out, self._graph.out_edges, id1)
+
+    @staticmethod
+    def _edges(preserved: dict, live: dict, key: int) -> dict:
+        edges = live.get(key)  # Read before the preserved objects, see get_node()
+        old = preserved.get(key, None)
+        if old is None:
+            return edges
+        return None if old is MISSING else old
+
+    def add_edge(self, id1: int, id2: int, weight: float) -> bool:
+        return False
+
+    def add_node(self, node_id: int, pos: tuple = None) -> bool:
+        return False
+
+    def remove_node(self, node_id: int) -> bool:
+        return False
+
+    def remove_edge(self, node_id1: int, node_id2: int) -> bool:
+        return False
+
+    def __str__(self):
+        return "\n|V|={} , |E|={} , MC={} (snapshot)".format(self.v_size, self.e_size, self.mc_size)
@@ -0,0 +1,29 @@
+import contextlib
+import os
+import sys
+
+from GraphAlgo import GraphAlgo
+
+
+def report(folder: str = "../data"):
+    """
+    * Loads every graph file under the given folder and prints the memory breakdown of it (DiGraph.memory_usage()).
+    """
+    kinds = ["nodes", "locations", "edges", "info", "nodes_table", "out_edges", "in_edges", "spatial_index", "degrees",
+             "total", "compact"]
+    print("{:<45}".format("file") + "".join("{:>15}".format(kind) for kind in kinds))
+    for root, dirs, files in sorted(os.walk(folder)):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            algo = GraphAlgo()
+            # load_from_json prints the errors of files that are not graphs
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                loaded = algo.load_from_json(path)
+            if not loaded:
+                continue
+            usage = algo.get_graph().memory_usage(deep=True)
+            print("{:<45}".format(os.path.relpath(path, folder)) + "".join("{:>15,}".format(usage[kind]) for kind in kinds))
+
+
+if __name__ == '__main__':
+    report(sys.argv[1] if len(sys.argv) > 1 else "../data")
@@ -0,0 +1,248 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from GraphInterface import GraphInterface
+
+SMALL_TASK = 2000  # Tasks of at most this many nodes are finished by Tarjan's algorithm in the worker
+
+_csr = None  # (n, out_indptr, out_indices, in_indptr, in_indices) of the graph, in every process of the pool
+_blocks = []  # The shared memory blocks the arrays above live in
+
+
+def _to_shared(arrays: list) -> (list, list):
+    """
+    * Copies the given arrays into new shared memory blocks.
+    @return: The blocks, and (name, dtype, size) of every block so other processes can attach to it
+    """
+    blocks, specs = [], []
+    for a in arrays:
+        block = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        np.ndarray(a.shape, dtype=a.dtype, buffer=block.buf)[:] = a
+        blocks.append(block)
+        specs.append((block.name, a.dtype.str, a.size))
+    return blocks, specs
+
+
+def _attach(n: int, specs: list):
+    """
+    * Pool initializer: maps the shared CSR arrays of the graph into this process (no copy).
+    """
+    global _csr, _blocks
+    _blocks = [shared_memory.SharedMemory(name=name) for name, dtype, size in specs]
+    arrays = [np.ndarray((size,), dtype=np.dtype(dtype), buffer=block.buf)
+              for block, (name, dtype, size) in zip(_blocks, specs)]
+    _csr = (n, *arrays)
+
+
+def _gather(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    * All the neighbors of the given rows of a CSR table, and the position in rows each of them came from.
+    """
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    owner = np.repeat(np.arange(len(rows)), lengths)
+    if total == 0:
+        return np.empty(0, dtype=indices.dtype), owner
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return indices[np.repeat(starts, lengths) + offsets], owner
+
+
+def _reach(indptr: np.ndarray, indices: np.ndarray, pivot: int, mask: np.ndarray) -> np.ndarray:
+    """
+    * Frontier by frontier BFS from pivot, restricted to the nodes in mask.
+    @return: A boolean array of the reached nodes
+    """
+    reached = np.zeros(len(mask), dtype=bool)
+    reached[pivot] = True
+    frontier = np.asarray([pivot])
+    while frontier.size > 0:
+        neighbors, owner = _gather(indptr, indices, frontier)
+        neighbors = neighbors[mask[neighbors] & ~reached[neighbors]]
+        frontier = np.unique(neighbors)
+        reached[frontier] = True
+    return reached
+
+
+def _trim(nodes: np.ndarray, mask: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    * Repeatedly removes the nodes with no in or no out edges inside mask - each of them is an SCC of its own.
+    @return: The remaining nodes, and the trimmed nodes
+    """
+    n, out_ptr, out_idx, in_ptr, in_idx = _csr
+    trimmed = []
+    while nodes.size > 0:
+        out_n, out_owner = _gather(out_ptr, out_idx, nodes)
+        in_n, in_owner = _gather(in_ptr, in_idx, nodes)
+        out_deg = np.bincount(out_owner, weights=mask[out_n], minlength=len(nodes))
+        in_deg = np.bincount(in_owner, weights=mask[in_n], minlength=len(nodes))
+        dead = (out_deg == 0) | (in_deg == 0)
+        if not dead.any():
+            break
+        trimmed.append(nodes[dead])
+        mask[nodes[dead]] = False
+        nodes = nodes[~dead]
+    return nodes, (np.concatenate(trimmed) if trimmed else np.empty(0, dtype=nodes.dtype))
+
+
+def _tarjan(nodes: np.ndarray) -> list:
+    """
+    * Iterative Tarjan's algorithm on the subgraph induced by nodes.
+    """
+    n, out_ptr, out_idx, in_ptr, in_idx = _csr
+    members = set(nodes.tolist())
+    index, low, stack, on_stack = {}, {}, [], set()
+    ans = []
+    counter = 0
+    for s in nodes.tolist():
+        if s in index:
+            continue
+        index[s] = low[s] = counter
+        counter += 1
+        stack.append(s)
+        on_stack.add(s)
+        work = [(s, iter(out_idx[out_ptr[s]:out_ptr[s + 1]].tolist()))]
+        while work:
+            v, neighbors = work[-1]
+            for w in neighbors:
+                if w not in members:
+                    continue
+                if w not in index:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(out_idx[out_ptr[w]:out_ptr[w + 1]].tolist())))
+                    break
+                elif w in on_stack and index[w] < low[v]:
+                    low[v] = index[w]
+            else:
+                work.pop()
+                if work and low[v] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[v]
+                if low[v] == index[v]:
+                    scc = []
+                    while True:
+                        w = stack.pop()
+                        on_stack.discard(w)
+                        scc.append(w)
+                        if w == v:
+                            break
+                    ans.append(np.asarray(scc))
+    return ans
+
+
+def _scc_task(nodes: np.ndarray) -> (list, list):
+    """
+    * One forward-backward step on the subgraph induced by nodes (a "color" class - no SCC crosses two classes):
+    * trim it, pick a pivot, and split the rest into the pivot's SCC (forward & backward reach),
+    * forward only, backward only and unreached nodes. Small classes are finished with Tarjan's algorithm.
+    @return: The SCCs found, and the new color classes to process
+    """
+    if len(nodes) <= SMALL_TASK:
+        return _tarjan(nodes), []
+    n, out_ptr, out_idx, in_ptr, in_idx = _csr
+    mask = np.zeros(n, dtype=bool)
+    mask[nodes] = True
+    nodes, trimmed = _trim(nodes, mask)
+    sccs = [trimmed[i:i + 1] for i in range(len(trimmed))]
+    if nodes.size == 0:
+        return sccs, []
+    pivot = int(nodes[0])
+    forward = _reach(out_ptr, out_idx, pivot, mask)[nodes]
+    backward = _reach(in_ptr, in_idx, pivot, mask)[nodes]
+    sccs.append(nodes[forward & backward])
+    tasks = [nodes[forward & ~backward], nodes[~forward & backward], nodes[~forward & ~backward]]
+    return sccs, [t for t in tasks if t.size > 0]
+
+
+def parallel_scc(graph: GraphInterface, workers: int = None) -> list:
+    """
+    * Finds all the Strongly Connected Components(SCC) of the graph on a pool of processes.
+    * The graph is turned into CSR arrays (out and in edges) in shared memory, so every process maps them once
+    * without copying. The work is split by forward-backward (FW-BW) steps: every step takes a color class of nodes,
+    * trims the nodes that have no in/out edges in the class, and splits the rest around a pivot into the pivot's SCC
+    * and three new color classes that are processed independently on the pool.
+    @param graph: The graph
+    @param workers: The number of processes (os.cpu_count() if None), 1 --> in this process
+    @return: A list of all the SCCs, each a list of node ids
+    """
+    keys = list(graph.get_all_v().keys())
+    n = len(keys)
+    if n == 0:
+        return []
+    position = {key: i for i, key in enumerate(keys)}
+    src, dst = [], []
+    for key in keys:
+        i = position[key]
+        for dest in graph.all_out_edges_of_node(key):
+            src.append(i)
+            dst.append(position[dest])
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    out_order = np.argsort(src, kind="stable")
+    in_order = np.argsort(dst, kind="stable")
+    out_ptr = np.concatenate([[0], np.cumsum(np.bincount(src, minlength=n))]).astype(np.int64)
+    in_ptr = np.concatenate([[0], np.cumsum(np.bincount(dst, minlength=n))]).astype(np.int64)
+    arrays = [out_ptr, dst[out_order], in_ptr, src[in_order]]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    sccs = []
+    everything = np.arange(n, dtype=np.int64)
+    if workers <= 1:
+        global _csr
+        _csr = (n, *arrays)
+        tasks = [everything]
+        while tasks:
+            found, new_tasks = _scc_task(tasks.pop())
+            sccs.extend(found)
+            tasks.extend(new_tasks)
+    else:
+        blocks, specs = _to_shared(arrays)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(n, specs)) as pool:
+                pending = {pool.submit(_scc_task, everything)}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        found, new_tasks = future.result()
+                        sccs.extend(found)
+                        pending |= {pool.submit(_scc_task, task) for task in new_tasks}
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+    return [[keys[i] for i in scc.tolist()] for scc in sccs]
+
+
+def benchmark(file_name: str, worker_counts: tuple = (1, 2, 4, 8)):
+    """
+    * Prints the run time and speedup of parallel_scc at every number of workers,
+    * and checks that the partition equals the one of the sequential algorithm.
+    """
+    from GraphAlgo import GraphAlgo
+    algo = GraphAlgo()
+    algo.load_from_json(file_name)
+    graph = algo.get_graph()
+    start = time.perf_counter()
+    expected = sorted(sorted(c) for c in algo.condensation().components)
+    print("{}: |V|={} |E|={} sequential (Tarjan) {:.3f}s".format(file_name, graph.v_size, graph.e_size,
+                                                                  time.perf_counter() - start))
+    base = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        sccs = parallel_scc(graph, workers)
+        took = time.perf_counter() - start
+        base = took if base is None else base
+        same = sorted(sorted(c) for c in sccs) == expected
+        print("workers={} {:.3f}s speedup x{:.2f} same partition: {}".format(workers, took, base / took, same))
+
+
+if __name__ == '__main__':
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else "../data/Graphs_no_pos/G_10000_80000_0.json")
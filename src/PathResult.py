@@ -0,0 +1,100 @@
+import copy
+from array import array
+from collections.abc import Sequence
+
+
+class PathNodes(Sequence):
+    """
+     * This class represents the nodes of a path as a read only list, which creates a node only when it is read:
+     * a copy of the graph's node with weight = the distance from the start of the path (what shortest_path used
+     * to return). A node is created once, reading it again returns the same object.
+     * The graph's nodes are captured when the path is built, so removing a node from the graph afterwards
+     * does not change the path. Two paths are equal if they have the same ids and distances.
+    """
+
+    def __init__(self, graph, ids: array, distances: array):
+        get_node = graph.get_node
+        self._sources = [get_node(key) for key in ids]
+        self._ids = ids
+        self._distances = distances
+        self._nodes = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self._ids)))]
+        if i < 0:
+            i += len(self._ids)
+        if not 0 <= i < len(self._ids):
+            raise IndexError("path index out of range")
+        if self._nodes is None:
+            self._nodes = [None] * len(self._ids)
+        node = self._nodes[i]
+        if node is None:
+            node = copy.copy(self._sources[i])
+            node.weight = self._distances[i]
+            self._nodes[i] = node
+        return node
+
+    def __contains__(self, node):
+        return getattr(node, "key", None) in self._ids
+
+    def __eq__(self, other):
+        if isinstance(other, PathNodes):
+            return self._ids == other._ids and self._distances == other._distances
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(getattr(node, "key", None) == key
+                                                   for node, key in zip(other, self._ids))
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((tuple(self._ids), tuple(self._distances)))
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class PathResult(tuple):
+    """
+     * This class represents the result of GraphAlgo.shortest_path: a (distance, nodes) tuple, so
+     * "dist, path = algo.shortest_path(a, b)" works as before, backed by two arrays -
+     * ids: array('q') of the node ids along the path, and distances: array('d') of the cumulative distance
+     * at every node. The nodes (NodeData) are only created when the list is read (see PathNodes),
+     * callers that only need the ids or distances never create them.
+    """
+
+    def __new__(cls, graph, ids: array, distances: array, distance: float = None):
+        """
+        @param graph: The graph the path was found on
+        @param ids: The node ids, in order
+        @param distances: The cumulative distances, in order
+        @param distance: The total distance (distances[-1] if None, inf for an empty path)
+        """
+        if distance is None:
+            distance = distances[-1] if len(distances) > 0 else float('inf')
+        ans = tuple.__new__(cls, (distance, PathNodes(graph, ids, distances)))
+        ans.ids = ids
+        ans.distances = distances
+        return ans
+
+    @property
+    def distance(self) -> float:
+        return self[0]
+
+    @property
+    def nodes(self) -> PathNodes:
+        return self[1]
+
+    def keys(self) -> list:
+        """
+        @return: The node ids of the path, as a list
+        """
+        return self.ids.tolist()
+
+    def hops(self) -> int:
+        """
+        @return: The number of edges on the path
+        """
+        return max(len(self.ids) - 1, 0)
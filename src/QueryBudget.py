@@ -0,0 +1,59 @@
+import threading
+import time
+
+
+class CancellationToken(object):
+    """
+     * This class represents a flag that another thread sets to stop the queries that were given it (via a QueryBudget).
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class QueryBudget(object):
+    """
+     * This class represents the budget of one or more GraphAlgo queries: a deadline, a maximal number of expansions
+     * (nodes settled or visited) and a cancellation token, each of them optional.
+     * A query that was given a budget spends it on every expansion, and once the budget runs out it stops right away
+     * and returns what it has found so far (e.g. the SCCs that were completed, or no path), and sets incomplete = True.
+     * A single budget may be shared by a few queries, e.g. all the queries of one request.
+    """
+
+    def __init__(self, timeout: float = None, max_expansions: int = None, token: CancellationToken = None,
+                 deadline: float = None):
+        """
+        @param timeout: Seconds from now until the deadline
+        @param max_expansions: The maximal number of expansions
+        @param token: A CancellationToken
+        @param deadline: An absolute deadline, in time.monotonic() seconds (the earlier of timeout and deadline is used)
+        """
+        if timeout is not None:
+            deadline = time.monotonic() + timeout if deadline is None else min(deadline, time.monotonic() + timeout)
+        self.deadline = deadline
+        self.max_expansions = max_expansions
+        self.token = token
+        self.expansions = 0
+        self.incomplete = False  # True once a query stopped because the budget ran out
+
+    def spend(self, expansions: int = 1) -> bool:
+        """
+        * Spends expansions from the budget (called by the queries).
+        @return: True if the query may go on, False if the budget ran out (and incomplete is set)
+        """
+        if self.incomplete:
+            return False
+        self.expansions += expansions
+        if (self.max_expansions is not None and self.expansions > self.max_expansions) \
+                or (self.token is not None and self.token.cancelled) \
+                or (self.deadline is not None and time.monotonic() > self.deadline):
+            self.incomplete = True
+            return False
+        return True
@@ -0,0 +1,175 @@
+import sys
+import time
+
+from Condensation import Condensation
+from GraphInterface import GraphInterface
+
+
+class ReachabilityIndex(object):
+    """
+     * This class represents an index that answers "can u reach v?" queries on a directed graph.
+     * The index is built on the condensation of the graph (every SCC is contracted to a single vertex),
+     * since two nodes of the same SCC reach each other, and reachability between SCCs is a question on a DAG.
+     * Small DAGs get a full transitive closure as bitsets (python ints), so a query is a single bit test.
+     * Larger DAGs get interval labels from a DFS post-order: a query is answered in O(1) by the labels in
+     * most cases, and falls back to a DFS pruned by the labels otherwise.
+     * The index is rebuilt lazily, on the first query after the graph has changed (by mc).
+    """
+
+    def __init__(self, graph: GraphInterface, max_bitset_components: int = 16384):
+        self._graph = graph
+        self.max_bitset_components = max_bitset_components
+        self._mc = None
+        self._comp = dict()
+        self._succ = []
+        self._closure = None
+        self._post = None
+        self._tree_low = None
+        self._reach_low = None
+        self.build_time = 0.0
+
+    def is_reachable(self, id1: int, id2: int) -> bool:
+        """
+        * Checks if there is a directed path from id1 to id2.
+        * Note: a node always reaches itself, if one of the nodes is not in the graph returns False
+        @param id1: The start node id
+        @param id2: The end node id
+        @return: True if id2 is reachable from id1, False o.w.
+        """
+        if self.is_stale():
+            self.build()
+        c1 = self._comp.get(id1)
+        c2 = self._comp.get(id2)
+        if c1 is None or c2 is None:
+            return False
+        if c1 == c2:
+            return True
+        if c1 > c2:  # Components are in topological order
+            return False
+        if self._closure is not None:
+            return (self._closure[c1] >> c2) & 1 == 1
+        return self._label_reachable(c1, c2)
+
+    def build(self, condensation: Condensation = None):
+        """
+        * (Re)builds the index for the current version of the graph.
+        @param condensation: The condensation of the current graph, built here if not given
+        """
+        start = time.perf_counter()
+        if condensation is None or condensation.mc != self._graph.get_mc():
+            condensation = Condensation(self._graph)
+        self._comp = condensation.comp_of
+        self._succ = condensation.succ
+        n_comps = condensation.v_size()
+        if n_comps <= self.max_bitset_components:
+            self._build_closure(n_comps)
+        else:
+            self._build_labels(n_comps)
+        self._mc = condensation.mc
+        self.build_time = time.perf_counter() - start
+
+    def is_stale(self) -> bool:
+        """
+        @return: True if the graph has changed since the index was built
+        """
+        return self._mc != self._graph.get_mc()
+
+    def mark_current(self, mc: int) -> bool:
+        """
+        * Marks the index as up to date for version mc of the graph, after a change that does not affect
+        * reachability (a batch of weight updates). Only an index that was up to date right before it (mc - 1) is kept.
+        @param mc: The current mc of the graph
+        @return: True if the index was marked, False o.w. (it is left to be rebuilt)
+        """
+        if self._mc != mc - 1:
+            return False
+        self._mc = mc
+        return True
+
+    def stats(self) -> dict:
+        """
+        * Reports the cost of the current index.
+        @return: A dictionary with the build time (seconds), memory (bytes), number of components and mode
+        """
+        if self.is_stale():
+            self.build()
+        memory = sys.getsizeof(self._comp) + sys.getsizeof(self._succ)
+        memory += sum(sys.getsizeof(s) for s in self._succ)
+        if self._closure is not None:
+            memory += sys.getsizeof(self._closure) + sum(sys.getsizeof(bits) for bits in self._closure)
+        else:
+            memory += sys.getsizeof(self._post) + sys.getsizeof(self._tree_low) + sys.getsizeof(self._reach_low)
+        return {"mode": "bitset" if self._closure is not None else "interval",
+                "components": len(self._succ),
+                "build_time": self.build_time,
+                "memory": memory,
+                "mc": self._mc}
+
+    def _build_closure(self, n_comps: int):
+        """
+        * Transitive closure of the DAG, every component holds the set of components it reaches as a bitset.
+        """
+        closure = [0] * n_comps
+        for c in range(n_comps - 1, -1, -1):  # Reverse topological order, successors are done first
+            bits = 1 << c
+            for d in self._succ[c]:
+                bits |= closure[d]
+            closure[c] = bits
+        self._closure = closure
+        self._post = self._tree_low = self._reach_low = None
+
+    def _build_labels(self, n_comps: int):
+        """
+        * Interval labels of the DAG from a DFS post-order:
+        * tree_low[c]..post[c] is the subtree of c in the DFS forest (everything in it is reachable from c),
+        * reach_low[c]..post[c] contains the post-order of everything reachable from c.
+        """
+        post = [-1] * n_comps
+        tree_low = [0] * n_comps
+        visited = [False] * n_comps
+        counter = 0
+        for s in range(n_comps):
+            if visited[s]:
+                continue
+            visited[s] = True
+            tree_low[s] = counter
+            work = [(s, iter(self._succ[s]))]
+            while work:
+                c, children = work[-1]
+                for d in children:
+                    if not visited[d]:
+                        visited[d] = True
+                        tree_low[d] = counter
+                        work.append((d, iter(self._succ[d])))
+                        break
+                else:
+                    work.pop()
+                    post[c] = counter
+                    counter += 1
+        reach_low = list(tree_low)
+        for c in range(n_comps - 1, -1, -1):
+            for d in self._succ[c]:
+                if reach_low[d] < reach_low[c]:
+                    reach_low[c] = reach_low[d]
+        self._post = post
+        self._tree_low = tree_low
+        self._reach_low = reach_low
+        self._closure = None
+
+    def _label_reachable(self, c1: int, c2: int) -> bool:
+        post, tree_low, reach_low = self._post, self._tree_low, self._reach_low
+        if tree_low[c1] <= post[c2] <= post[c1]:
+            return True  # c2 is in the DFS subtree of c1
+        if not reach_low[c1] <= post[c2] <= post[c1]:
+            return False
+        stack = [c1]
+        visited = {c1}
+        while stack:
+            c = stack.pop()
+            for d in self._succ[c]:
+                if d == c2:
+                    return True
+                if d not in visited and d < c2 and reach_low[d] <= post[c2] <= post[d]:
+                    visited.add(d)
+                    stack.append(d)
+        return False
@@ -0,0 +1,96 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from GraphInterface import GraphInterface
+
+
+class SparseGraph(object):
+    """
+     * This class represents a read only, array form of a directed graph, made for vectorized traversals.
+     * The nodes are numbered 0..n-1 (in the order of get_all_v()), and the edges are held twice as
+     * sparse CSR matrices - out edges (row = src) and in edges (row = dest).
+     * A traversal expands a whole frontier at once by gathering the CSR rows of all the frontier nodes,
+     * instead of pushing single nodes through a queue.
+    """
+
+    def __init__(self, graph: GraphInterface):
+        self.keys = list(graph.get_all_v().keys())  # index --> node id
+        self.index = {key: i for i, key in enumerate(self.keys)}  # node id --> index
+        n = len(self.keys)
+        src = []
+        dst = []
+        weights = []
+        for key in self.keys:
+            i = self.index[key]
+            for dest, edge in graph.all_out_edges_of_node(key).items():
+                src.append(i)
+                dst.append(self.index[dest])
+                weights.append(edge.weight)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        # Note: edges of weight 0 are kept as explicit entries, so the structure of the graph is not lost
+        self.out_csr = csr_matrix((weights, (src, dst)), shape=(n, n))
+        self.in_csr = csr_matrix((weights, (dst, src)), shape=(n, n))
+        self.mc = graph.get_mc()
+
+    def update_weights(self, changes: list):
+        """
+        * Writes new weights of existing edges into both CSR matrices in place (the structure does not change).
+        @param changes: A list of (src, dest, old weight, new weight), as reported by DiGraph.subscribe()
+        """
+        for src, dest, old, new in changes:
+            i, j = self.index[src], self.index[dest]
+            for csr, row, col in ((self.out_csr, i, j), (self.in_csr, j, i)):
+                start = csr.indptr[row]
+                k = start + int(np.flatnonzero(csr.indices[start:csr.indptr[row + 1]] == col)[0])
+                csr.data[k] = new
+
+    def size(self) -> int:
+        return len(self.keys)
+
+    def bfs_levels(self, src: int, reverse: bool = False, budget=None) -> np.ndarray:
+        """
+        * Breadth first search from node src, a whole level is expanded in every step.
+        @param src: The start node id
+        @param reverse: True to traverse the in edges (the transposed graph)
+        @param budget: An optional QueryBudget, every expanded frontier spends its size, the search stops once it ran out
+        @return: An array of the BFS level of every node index, -1 for unreachable nodes
+        """
+        levels = np.full(self.size(), -1, dtype=np.int64)
+        if src not in self.index:
+            return levels
+        csr = self.in_csr if reverse else self.out_csr
+        frontier = np.asarray([self.index[src]], dtype=np.int64)
+        levels[frontier] = 0
+        level = 0
+        while frontier.size > 0:
+            if budget is not None and not budget.spend(int(frontier.size)):
+                break
+            level += 1
+            neighbors = self.gather(csr, frontier)
+            neighbors = neighbors[levels[neighbors] == -1]
+            frontier = np.unique(neighbors)
+            levels[frontier] = level
+        return levels
+
+    def reachable(self, src: int, reverse: bool = False, budget=None) -> np.ndarray:
+        """
+        @return: A boolean mask of all the node indexes reachable from src
+        """
+        return self.bfs_levels(src, reverse, budget) >= 0
+
+    @staticmethod
+    def gather(csr: csr_matrix, rows: np.ndarray) -> np.ndarray:
+        """
+        * Returns the column indexes of all the entries on the given rows of a CSR matrix (with repetitions),
+        * i.e. all the neighbors of a frontier, without a python level loop.
+        """
+        starts = csr.indptr[rows]
+        lengths = csr.indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        # Position of every gathered entry: its row start + its offset inside the row
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return csr.indices[np.repeat(starts, lengths) + offsets]
@@ -0,0 +1,258 @@
+import heapq
+import math
+import sys
+
+
+class SpatialIndex(object):
+    """
+     * This class represents a spatial index over the locations of the nodes of a graph.
+     * The index is a uniform grid on the (x, y) plane, stored as a dictionary of cells,
+     * so inserting and removing a node is O(1) and a query only visits the cells around the query point.
+     * The cell size is recomputed (and the grid rebuilt) every time the number of points doubles,
+     * which keeps roughly one point per cell at an amortized O(1) cost.
+     * The bounding box of all the points is maintained on every insert, and is only re-scanned
+     * after a point that lay on its border was removed.
+     * Distances are euclidean over <x,y,z> (as GeoLocation.distance), boxes are over <x,y>.
+    """
+
+    def __init__(self):
+        self._points = dict()  # {key: (x, y, z)}
+        self._cells = dict()  # {(cell_x, cell_y): {key, ..}}
+        self._cell_size = 1.0
+        self._built_size = 0
+        self._max = [float('-inf')] * 3
+        self._min = [float('inf')] * 3
+        self._box_dirty = False
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def insert(self, key: int, location) -> bool:
+        """
+        * Adds (or moves) the point of the given node to the index.
+        @param key: The node ID
+        @param location: GeoLocation (or a (x, y, z) tuple) of the node
+        @return: True if the point was indexed, False o.w. (location is None)
+        """
+        if location is None:
+            return False
+        p = self._to_point(location)
+        if key in self._points:
+            self.remove(key)
+        self._points[key] = p
+        self._cells.setdefault(self._cell_of(p[0], p[1]), set()).add(key)
+        if not self._box_dirty:
+            for i in range(3):
+                if p[i] > self._max[i]:
+                    self._max[i] = p[i]
+                if p[i] < self._min[i]:
+                    self._min[i] = p[i]
+        if len(self._points) >= 16 and len(self._points) >= 2 * self._built_size:
+            self._rebuild()
+        return True
+
+    def remove(self, key: int) -> bool:
+        """
+        * Removes the point of the given node from the index.
+        @param key: The node ID
+        @return: True if the point was removed, False o.w.
+        """
+        p = self._points.pop(key, None)
+        if p is None:
+            return False
+        cell = self._cell_of(p[0], p[1])
+        keys = self._cells[cell]
+        keys.discard(key)
+        if len(keys) == 0:
+            del self._cells[cell]
+        for i in range(3):
+            if p[i] == self._max[i] or p[i] == self._min[i]:
+                self._box_dirty = True
+        return True
+
+    def bounding_box(self) -> tuple:
+        """
+        * Returns the bounding box of all the indexed points.
+        @return: max_x, max_y, max_z, min_x, min_y, min_z (-inf & inf if the index is empty)
+        """
+        if self._box_dirty:
+            self._max = [float('-inf')] * 3
+            self._min = [float('inf')] * 3
+            for p in self._points.values():
+                for i in range(3):
+                    if p[i] > self._max[i]:
+                        self._max[i] = p[i]
+                    if p[i] < self._min[i]:
+                        self._min[i] = p[i]
+            self._box_dirty = False
+        return self._max[0], self._max[1], self._max[2], self._min[0], self._min[1], self._min[2]
+
+    def nearest(self, pos: tuple):
+        """
+        * Finds the node which is the closest to the given position.
+        @param pos: (x, y, z) or (x, y) position
+        @return: The node ID of the closest node, None if the index is empty
+        """
+        ans = self.k_nearest(pos, 1)
+        if len(ans) == 0:
+            return None
+        return ans[0][0]
+
+    def k_nearest(self, pos: tuple, k: int) -> list:
+        """
+        * Finds the k closest nodes to the given position.
+        * The cells are visited ring by ring around the cell of pos, until no unvisited cell can hold
+        * a point closer than the current k-th closest point.
+        @param pos: (x, y, z) or (x, y) position
+        @param k: The number of nodes to return
+        @return: A list of (node_id, distance) pairs, ordered by distance
+        """
+        if k <= 0 or len(self._points) == 0:
+            return []
+        q = self._to_point(pos)
+        k = min(k, len(self._points))
+        cx, cy = self._cell_of(q[0], q[1])
+        best = []  # max heap of the k closest points: (-distance, key)
+        r = 0
+        seen = 0
+        while seen < len(self._points):
+            if (2 * r + 1) ** 2 > 4 * len(self._cells):
+                return self._scan_nearest(q, k)  # The grid is too sparse around pos, a full scan is cheaper
+            for cell in self._ring(cx, cy, r):
+                for key in self._cells.get(cell, ()):
+                    seen += 1
+                    d = self._distance(q, self._points[key])
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, key))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, key))
+            if len(best) == k:
+                # Distance from pos to the closest cell that was not visited yet
+                cs = self._cell_size
+                bound = min(q[0] - (cx - r) * cs, (cx + r + 1) * cs - q[0],
+                            q[1] - (cy - r) * cs, (cy + r + 1) * cs - q[1])
+                if -best[0][0] <= bound:
+                    break
+            r += 1
+        return sorted([(key, -d) for d, key in best], key=lambda pair: pair[1])
+
+    def in_radius(self, pos: tuple, radius: float) -> list:
+        """
+        * Finds all the nodes in distance radius (or less) from the given position.
+        @param pos: (x, y, z) or (x, y) position
+        @param radius: The maximal distance from pos
+        @return: A list of (node_id, distance) pairs, ordered by distance
+        """
+        if not radius >= 0:  # Negative or nan
+            return []
+        q = self._to_point(pos)
+        ans = []
+        for key in self._box_keys(q[0] - radius, q[1] - radius, q[0] + radius, q[1] + radius):
+            d = self._distance(q, self._points[key])
+            if d <= radius:
+                ans.append((key, d))
+        ans.sort(key=lambda pair: pair[1])
+        return ans
+
+    def in_box(self, min_x: float, min_y: float, max_x: float, max_y: float) -> list:
+        """
+        * Finds all the nodes inside the given rectangle (borders included).
+        @return: A list of node IDs
+        """
+        if min_x > max_x or min_y > max_y:
+            return []
+        return list(self._box_keys(min_x, min_y, max_x, max_y))
+
+    def memory_usage(self, values=None) -> int:
+        """
+        * Returns an estimate of the memory (bytes) the index takes: the points and cells dictionaries,
+        * the point tuples and the cell key tuples and sets (see DiGraph.memory_usage).
+        @param values: A function that returns the size of the given values (coordinates, cell numbers),
+        *              None to not count them
+        @return: The number of bytes
+        """
+        ans = sys.getsizeof(self._points) + sys.getsizeof(self._cells)
+        for p in self._points.values():
+            ans += sys.getsizeof(p)
+            if values is not None:
+                ans += values(*p)
+        for cell, keys in self._cells.items():
+            ans += sys.getsizeof(cell) + sys.getsizeof(keys)
+            if values is not None:
+                ans += values(*cell)
+        return ans
+
+    def _box_keys(self, min_x, min_y, max_x, max_y):
+        """
+        * Yields the keys of all the points inside the given rectangle.
+        * The rectangle is first clipped to the bounding box (so an infinite one is fine),
+        * and if it covers more cells than the grid holds, the non empty cells are scanned instead.
+        """
+        if not self._points:
+            return
+        box_max_x, box_max_y, box_max_z, box_min_x, box_min_y, box_min_z = self.bounding_box()
+        min_x, min_y = max(min_x, box_min_x), max(min_y, box_min_y)
+        max_x, max_y = min(max_x, box_max_x), min(max_y, box_max_y)
+        if min_x > max_x or min_y > max_y:
+            return
+        x0, y0 = self._cell_of(min_x, min_y)
+        x1, y1 = self._cell_of(max_x, max_y)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._cells):
+            cells = [cell for cell in self._cells if x0 <= cell[0] <= x1 and y0 <= cell[1] <= y1]
+        else:
+            cells = [(i, j) for i in range(x0, x1 + 1) for j in range(y0, y1 + 1)]
+        for cell in cells:
+            for key in self._cells.get(cell, ()):
+                x, y, z = self._points[key]
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    yield key
+
+    def _scan_nearest(self, q, k):
+        pairs = [(key, self._distance(q, p)) for key, p in self._points.items()]
+        return heapq.nsmallest(k, pairs, key=lambda pair: pair[1])
+
+    def _rebuild(self):
+        """
+        * Recomputes the cell size from the bounding box, so that there is about one point per cell,
+        * and re-hashes all the points into the new grid.
+        """
+        max_x, max_y, max_z, min_x, min_y, min_z = self.bounding_box()
+        extent = max(max_x - min_x, max_y - min_y)
+        side = math.ceil(math.sqrt(len(self._points)))
+        self._cell_size = extent / side if extent > 0 else 1.0
+        self._cells = dict()
+        for key, p in self._points.items():
+            self._cells.setdefault(self._cell_of(p[0], p[1]), set()).add(key)
+        self._built_size = len(self._points)
+
+    def _cell_of(self, x, y):
+        return math.floor(x / self._cell_size), math.floor(y / self._cell_size)
+
+    @staticmethod
+    def _ring(cx, cy, r):
+        """
+        * Yields the cells at chebyshev distance exactly r from (cx, cy).
+        """
+        if r == 0:
+            yield cx, cy
+            return
+        for i in range(cx - r, cx + r + 1):
+            yield i, cy - r
+            yield i, cy + r
+        for j in range(cy - r + 1, cy + r):
+            yield cx - r, j
+            yield cx + r, j
+
+    @staticmethod
+    def _to_point(location) -> tuple:
+        if isinstance(location, tuple) or isinstance(location, list):
+            z = location[2] if len(location) > 2 else 0
+            return float(location[0]), float(location[1]), float(z)
+        return float(location.x), float(location.y), float(location.z)
+
+    @staticmethod
+    def _distance(p1, p2):
+        return ((p1[0] - p2[0]) ** 2 + (p1[1] - p2[1]) ** 2 + (p1[2] - p2[2]) ** 2) ** 0.5
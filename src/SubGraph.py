@@ -0,0 +1,120 @@
+from collections.abc import Mapping
+
+from GraphInterface import GraphInterface
+
+
+class FilteredEdges(Mapping):
+    """
+     * This class represents a read only view of an adjacency dictionary, limited to the keys in members.
+     * Nothing is copied: every lookup goes to the underlying dictionary, and iteration skips the other keys.
+    """
+
+    def __init__(self, edges: dict, members):
+        self._edges = edges
+        self._members = members
+
+    def __getitem__(self, key):
+        if key not in self._members:
+            raise KeyError(key)
+        return self._edges[key]
+
+    def get(self, key, default=None):
+        return self._edges.get(key, default) if key in self._members else default
+
+    def __contains__(self, key):
+        return key in self._members and key in self._edges
+
+    def __iter__(self):
+        members = self._members
+        return (key for key in self._edges if key in members)
+
+    def __len__(self):
+        members = self._members
+        return sum(1 for key in self._edges if key in members)
+
+    def items(self):
+        members = self._members
+        return ((key, edge) for key, edge in self._edges.items() if key in members)
+
+    def values(self):
+        members = self._members
+        return (edge for key, edge in self._edges.items() if key in members)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class SubGraph(GraphInterface):
+    """
+     * This class represents the subgraph of a graph induced by a set of nodes: the nodes in the set
+     * and the edges between them. It is a live view - nothing is copied, the adjacency dictionaries
+     * of the graph are read through FilteredEdges views, so changes of the graph show in the view.
+     * GraphAlgo runs on it like on any other graph.
+     * Note: all the methods that change the graph do nothing and return False.
+    """
+
+    def __init__(self, graph: GraphInterface, node_ids):
+        self._graph = graph
+        self._members = node_ids if isinstance(node_ids, (set, frozenset)) else frozenset(node_ids)
+        self._mc = None
+        self._all_v = None
+        self._e_size = 0
+
+    def _refresh(self):
+        """
+        * Recounts the nodes and edges of the view, once per version (mc) of the graph.
+        """
+        mc = self._graph.get_mc()
+        if self._mc == mc:
+            return
+        nodes = self._graph.get_all_v()
+        self._all_v = {key: nodes[key] for key in self._members if key in nodes}
+        self._e_size = sum(len(self.all_out_edges_of_node(key)) for key in self._all_v)
+        self._mc = mc
+
+    @property
+    def v_size(self) -> int:
+        self._refresh()
+        return len(self._all_v)
+
+    @property
+    def e_size(self) -> int:
+        self._refresh()
+        return self._e_size
+
+    def get_mc(self) -> int:
+        return self._graph.get_mc()
+
+    def get_node(self, key):
+        return self._graph.get_node(key) if key in self._members else None
+
+    def get_all_v(self) -> dict:
+        self._refresh()
+        return self._all_v
+
+    def all_in_edges_of_node(self, id1: int) -> dict:
+        if id1 not in self._members:
+            return None
+        edges = self._graph.all_in_edges_of_node(id1)
+        return None if edges is None else FilteredEdges(edges, self._members)
+
+    def all_out_edges_of_node(self, id1: int) -> dict:
+        if id1 not in self._members:
+            return None
+        edges = self._graph.all_out_edges_of_node(id1)
+        return None if edges is None else FilteredEdges(edges, self._members)
+
+    def add_edge(self, id1: int, id2: int, weight: float) -> bool:
+        return False
+
+    def add_node(self, node_id: int, pos: tuple = None) -> bool:
+        return False
+
+    def remove_node(self, node_id: int) -> bool:
+        return False
+
+    def remove_edge(self, node_id1: int, node_id2: int) -> bool:
+        return False
+
+    def __str__(self):
+        return "\n|V|={} , |E|={} , MC={} (subgraph)".format(self.v_size, self.e_size, self.get_mc())
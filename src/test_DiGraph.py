@@ -1,6 +1,6 @@
 from unittest import TestCase
 
-from src.DiGraph import DiGraph
+from DiGraph import DiGraph, GeoLocation
 import random as r
 
 
@@ -51,6 +51,264 @@ class TestDiGraph(TestCase):
 
         assert g1.out_edges.get(5).get(1) is None
 
+    def test_fingerprint(self):
+        g1 = self.example_graph()
+        g2 = DiGraph()  # The same graph, built in a different order
+        for i in reversed(range(7)):
+            g2.add_node(i)
+        for src in reversed(range(7)):
+            for dest, edge in g1.all_out_edges_of_node(src).items():
+                g2.add_edge(src, dest, edge.weight)
+        assert g1.fingerprint() == g2.fingerprint() and g1.cache_key() == g2.cache_key()
+        assert g1 == g2
+
+        fingerprint = g1.fingerprint()
+        g1.remove_edge(5, 1)
+        assert g1.fingerprint() != fingerprint and not g1 == g2
+        g1.add_edge(5, 1, 2)  # Same edge, different weight
+        assert g1.fingerprint() != fingerprint and not g1 == g2
+        g1.remove_edge(5, 1)
+        g1.add_edge(5, 1, 1)
+        assert g1.fingerprint() == fingerprint and g1 == g2
+
+        g1.remove_node(0)
+        g2.remove_node(0)
+        assert g1 == g2
+        g1.add_node(0, (1, 2, 0))
+        g2.add_node(0)
+        assert not g1 == g2
+        g2.set_node_location(0, (1, 2, 0))
+        assert g1.fingerprint() == g2.fingerprint() and g1 == g2
+
+    def test_snapshot(self):
+        g1 = self.example_graph()
+        snap = g1.snapshot()
+        before = {key: dict(g1.all_out_edges_of_node(key)) for key in g1.get_all_v()}
+        in_before = {key: dict(g1.all_in_edges_of_node(key)) for key in g1.get_all_v()}
+
+        assert snap.all_out_edges_of_node(4) is g1.all_out_edges_of_node(4)  # Shared until changed
+        g1.remove_edge(4, 5)
+        g1.add_edge(3, 6, 2)
+        g1.remove_node(0)
+        g1.add_node(7)
+        g1.add_edge(7, 1, 1)
+        assert snap.all_out_edges_of_node(4) is not g1.all_out_edges_of_node(4)
+        assert snap.all_out_edges_of_node(1) is g1.all_out_edges_of_node(1)
+
+        assert snap.get_mc() != g1.get_mc() and snap.v_size == 7 and snap.e_size == 9
+        assert sorted(snap.get_all_v()) == list(range(7))
+        assert snap.get_node(7) is None and snap.get_node(0) is not None
+        for key in range(7):
+            assert snap.all_out_edges_of_node(key) == before[key]
+            assert snap.all_in_edges_of_node(key) == in_before[key]
+        assert not snap.add_node(8) and not snap.remove_edge(1, 4)
+
+        g2 = DiGraph()
+        snap2 = g1.snapshot()
+        g1.add_edge(1, 3, 1)
+        g1.set_node_location(1, (1, 1, 0))
+        assert snap.all_out_edges_of_node(1) == before[1] and snap.get_node(1).location is None
+        assert len(snap2.all_out_edges_of_node(1)) == 1 and len(g1.all_out_edges_of_node(1)) == 2
+        assert len(g2._snapshots) == 0 and len(g1._snapshots) == 2
+
+    def test_pickle(self):
+        import pickle
+
+        g1 = self.example_graph()
+        g1.set_node_location(1, (1, 2, 0))
+        snap = g1.snapshot()
+        g1.subscribe(lambda graph, changes: None)
+        g2 = pickle.loads(pickle.dumps(g1))
+        assert g2 == g1 and g2.get_mc() == g1.get_mc() and snap.v_size == 7
+        assert len(g2._snapshots) == 0 and len(g2._listeners) == 0 and g2.journal is None
+        assert g2.spatial_index.nearest((1, 2, 0)) == 1 and g2.top_k_by_degree(1)[0][1] == 2
+        assert g2.remove_node(0) and g2.add_edge(1, 3, 1) and g1.v_size == 7
+        assert pickle.loads(pickle.dumps(DiGraph())) == DiGraph()
+
+    def test_update_edge_weights(self):
+        g1 = self.example_graph()
+        events = []
+        token = g1.subscribe(lambda graph, changes: events.append(changes))
+        edge = g1.all_out_edges_of_node(4)[5]
+        mc = g1.get_mc()
+
+        assert g1.update_edge_weight(4, 5, 3.5)
+        assert g1.all_out_edges_of_node(4)[5] is edge and g1.all_in_edges_of_node(5)[4].weight == 3.5
+        assert g1.get_mc() == mc + 1 and g1.e_size == 9
+        assert not g1.update_edge_weight(5, 4, 1) and not g1.update_edge_weight(4, 5, -1)
+        assert g1.update_edge_weight(4, 5, 3.5) and g1.get_mc() == mc + 1  # Same weight, nothing changed
+
+        snap = g1.snapshot()
+        assert g1.update_edge_weights([(0, 2, 2), (2, 0, 2), (1, 9, 1), (6, 0, 1)]) == 2
+        assert g1.get_mc() == mc + 2
+        assert snap.all_out_edges_of_node(0)[2].weight == 1 and g1.all_in_edges_of_node(2)[0].weight == 2
+        assert events == [[(4, 5, 1, 3.5)], [(0, 2, 1, 2), (2, 0, 1, 2)]]
+
+        g2 = self.example_graph()
+        g2.remove_edge(4, 5)
+        g2.add_edge(4, 5, 3.5)
+        g2.update_edge_weights([(0, 2, 2), (2, 0, 2)])
+        assert g1 == g2 and g1.fingerprint() == g2.fingerprint()
+
+        g1.remove_node(4)
+        assert sorted(events[-1]) == [(1, 4, 1, None), (4, 2, 1, None), (4, 5, 3.5, None)]
+        assert g1.unsubscribe(token) and not g1.unsubscribe(token)
+        g1.add_edge(1, 2, 1)
+        assert len(events) == 3
+
+    def test_diff(self):
+        from GraphDiff import GraphPatch, diff, apply_patch
+
+        g1 = self.example_graph()
+        g1.set_node_location(2, (1, 2, 0))
+        g1.set_node_location(3, (1, 1, 0))
+        g2 = self.example_graph()
+        g2.set_node_location(2, (1, 2, 0))
+        assert diff(g1, g1.snapshot()).is_empty()
+
+        g2.remove_node(6)
+        g2.remove_edge(4, 2)
+        g2.add_node(7, (3, 3, 0))
+        g2.add_edge(7, 0, 2)
+        g2.add_edge(1, 7, 2)
+        g2.update_edge_weight(5, 1, 4)
+        g2.set_node_location(1, (5, 5, 0))
+        patch = diff(g1, g2)
+        assert patch.removed_nodes == [6] and patch.added_nodes == [(7, [3, 3, 0])]
+        assert sorted(patch.moved_nodes, key=lambda m: m[0]) == [(1, [5, 5, 0]), (3, None)]
+        assert patch.removed_edges == [(4, 2)] and sorted(patch.added_edges) == [(1, 7, 2), (7, 0, 2)]
+        assert patch.weights == [(5, 1, 1, 4)]
+
+        copy = GraphPatch.from_bytes(patch.to_bytes())
+        events = []
+        g1.subscribe(lambda graph, changes: events.append(changes))
+        node = g1.get_node(3)
+        assert apply_patch(g1, copy) and g1 == g2
+        assert g1.get_node(3) is node and node.location is None  # The location was cleared in place
+        assert not any(3 in change[:2] for batch in events for change in batch)
+        assert not apply_patch(g1, copy)  # g1 is not the base version anymore
+        assert diff(g1, g2).is_empty()
+
+    def test_degree_index(self):
+        g1 = DiGraph()
+        for i in range(50):
+            g1.add_node(i)
+        for i in range(400):
+            g1.add_edge(r.randint(0, 49), r.randint(0, 49), 1)
+        for i in range(100):
+            g1.remove_edge(r.randint(0, 49), r.randint(0, 49))
+        for key in r.sample(range(50), 10):
+            g1.remove_node(key)
+        g1.add_node(100)
+
+        for direction, edges_of in [("out", g1.all_out_edges_of_node), ("in", g1.all_in_edges_of_node)]:
+            degrees = {key: len(edges_of(key)) for key in g1.get_all_v()}
+            histogram = {}
+            for degree in degrees.values():
+                histogram[degree] = histogram.get(degree, 0) + 1
+            assert g1.degree_histogram(direction) == dict(sorted(histogram.items()))
+            top = g1.top_k_by_degree(5, direction)
+            assert [d for key, d in top] == sorted(degrees.values(), reverse=True)[:5]
+            assert all(degrees[key] == d for key, d in top)
+            assert len(g1.top_k_by_degree(1000, direction)) == g1.v_size
+        assert g1.out_degree(100) == 0 and g1.in_degree(-1) == -1
+        self.assertRaises(ValueError, g1.top_k_by_degree, 3, "both")
+
+    def test_bulk_add(self):
+        g1 = self.example_graph()
+        g2 = DiGraph()
+        events = []
+        g2.subscribe(lambda graph, changes: events.append(changes))
+        assert g2.add_nodes_from(range(7)) == 7 and g2.get_mc() == 1
+        edges = [(src, dest, edge.weight) for src in range(7) for dest, edge in g1.all_out_edges_of_node(src).items()]
+        edges += [(0, 2, 5), (1, 1, 1), (1, 9, 1), (2, 5, -1)]  # An existing edge, a self loop, a missing node, w < 0
+        assert g2.add_edges_from(*zip(*edges)) == 9 and g2.get_mc() == 2
+        assert g1 == g2 and g1.fingerprint() == g2.fingerprint() and g2.e_size == 9
+        assert g1.degree_histogram("in") == g2.degree_histogram("in") and g2.out_degree(4) == 2
+        assert len(events) == 1 and len(events[0]) == 9
+
+        snap = g2.snapshot()  # With a snapshot the edges are added one by one
+        assert g2.add_nodes_from([7, 0], [(1, 2, 0), None]) == 1 and g2.get_node(7).location.x == 1
+        assert g2.add_edges_from([7, 1], [1, 7], [1, 1]) == 2
+        assert snap.v_size == 7 and snap.all_out_edges_of_node(1) == g1.all_out_edges_of_node(1)
+        assert g2.out_degree(7) == 1 and g2.in_degree(7) == 1 and g2.spatial_index.nearest((1, 2, 0)) == 7
+
+    def test_memory_usage(self):
+        g1 = self.example_graph()
+        usage = g1.memory_usage()
+        shallow = g1.memory_usage(deep=False)
+        assert usage["total"] == sum(v for k, v in usage.items() if k not in ("total", "compact"))
+        assert usage["total"] > shallow["total"] and shallow["info"] == 0
+        assert usage["locations"] == 0 and usage["compact"] < usage["total"]
+
+        g1.add_node(7, (1.5, 2.5, 0))
+        g1.add_edge(7, 0, 1.25)
+        bigger = g1.memory_usage()
+        assert bigger["locations"] > 0 and bigger["edges"] > usage["edges"] and bigger["compact"] > usage["compact"]
+        assert bigger["spatial_index"] > usage["spatial_index"] and bigger["degrees"] >= usage["degrees"] > 0
+        assert bigger["total"] == sum(v for k, v in bigger.items() if k not in ("total", "compact"))
+
+    def test_spatial_index(self):
+        g1 = DiGraph()
+        points = {}
+        for i in range(200):
+            points[i] = (r.uniform(35, 36), r.uniform(32, 33), 0.0)
+            g1.add_node(i, points[i])
+        g1.add_node(200)  # A node without a location is not indexed
+        index = g1.spatial_index
+        assert len(index) == 200
+
+        def dist(p1, p2):
+            return ((p1[0] - p2[0]) ** 2 + (p1[1] - p2[1]) ** 2 + (p1[2] - p2[2]) ** 2) ** 0.5
+
+        q = (35.5, 32.5, 0.0)
+        by_dist = sorted(points, key=lambda k: dist(q, points[k]))
+        assert index.nearest(q) == by_dist[0]
+        assert [key for key, d in index.k_nearest(q, 10)] == by_dist[:10]
+        assert sorted(key for key, d in index.in_radius(q, 0.2)) == \
+               sorted(k for k in points if dist(q, points[k]) <= 0.2)
+        assert sorted(index.in_box(35.2, 32.2, 35.4, 32.9)) == \
+               sorted(k for k in points if 35.2 <= points[k][0] <= 35.4 and 32.2 <= points[k][1] <= 32.9)
+        inf = float('inf')
+        assert len(index.in_radius(q, inf)) == 200 and len(index.in_radius(q, 1e300)) == 200
+        assert index.in_radius(q, float('nan')) == [] and sorted(index.in_box(-inf, -inf, inf, inf)) == sorted(points)
+        assert sorted(index.in_box(35.5, -inf, inf, inf)) == sorted(k for k in points if points[k][0] >= 35.5)
+        assert DiGraph().spatial_index.in_radius(q, inf) == []
+
+        # The bounding box stays correct while nodes are removed
+        for key in range(150):
+            g1.remove_node(key)
+        rest = [points[k] for k in range(150, 200)]
+        assert index.bounding_box() == (max(p[0] for p in rest), max(p[1] for p in rest), 0.0,
+                                        min(p[0] for p in rest), min(p[1] for p in rest), 0.0)
+        assert index.nearest(points[0]) != 0
+        assert index.k_nearest(q, 100)[-1][0] in range(150, 200)
+        assert len(index.k_nearest(q, 100)) == 50
+
+    def test_locations(self):
+        import GraphFormats
+        import os
+        import tempfile
+
+        g1 = self.example_graph()
+        assert g1.add_node(7, (1.5, 2.5))  # 2D positions lie on z = 0
+        assert (g1.get_node(7).location.x, g1.get_node(7).location.z) == (1.5, 0)
+        assert g1.spatial_index.nearest((1.5, 2.5, 0)) == 7
+
+        mc = g1.get_mc()
+        assert g1.set_node_location(0, (3, 4)) and g1.get_mc() == mc + 1
+        assert not g1.set_node_location(9, (3, 4)) and g1.get_mc() == mc + 1
+        assert g1.set_node_location(7, None) and g1.get_node(7).location is None and g1.get_mc() == mc + 2
+        assert 7 not in g1.spatial_index and g1.set_node_location(7, None) and g1.get_mc() == mc + 2
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "g.json")
+            with open(path, "w") as f:
+                f.write('{"Edges":[{"src":0,"w":1.5,"dest":1}],"Nodes":[{"pos":"1,2","id":0},{"pos":"3,4,0","id":1}]}')
+            g2 = GraphFormats.read_json(path)
+            assert g2.get_node(0).location == GeoLocation((1, 2, 0))
+            assert g2.spatial_index.nearest((3, 4, 0)) == 1
+
     def graph_creator(self, node_size: int = 0, edge_size: int = 0) -> object:
         g1 = DiGraph()
 